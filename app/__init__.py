@@ -1,38 +1,146 @@
-from _socket import gaierror
 from functools import wraps
-from smtplib import SMTPException
 
-from flask import Flask, render_template, flash, abort, request, redirect, url_for
+from flask import Flask, render_template, flash, abort, request, redirect, url_for, jsonify
 
 from flask_login import login_required, login_user, logout_user, LoginManager, current_user
-from flask_mail import Mail, Message
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
-from werkzeug.security import generate_password_hash
-from flask_migrate import Migrate
-from app.forms import TicketForm, LoginForm, RegistrationForm, CommentForm, HRRegistrationForm, StatusForm
-from app.models import Ticket, User, Comment
+import sys
+import click
+from app.models import Attachment, Ticket, User, Comment, PRIORITIES, TICKET_STATUSES
 from app.extension import db
+from app import (attachments, bootstrap, cache, database, escalation, events, fragments, history, instrumentation,
+                 mailqueue, passwords, ratelimit, search, services, similarity, stats, usercache)
+from app.cli import LazyAppGroup
+from app.queries import dashboard_filters, dashboard_page, find_archived_ticket, live_ticket_or_404
+from app.ratelimit import rate_limited, submitted_email
+from app.recipients import invalidate_hr_recipients
+from app.usercache import invalidate_user, load_cached_user
 
 
 login_manager = LoginManager()
-mail = Mail()
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__, template_folder='templates')
+    app.cli = LazyAppGroup(app.name)
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'default_secret_key')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI', 'sqlite:///ticketing_system.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Off in production: each worker then starts without schema work, and the schema comes from
+    # `flask update-schema`, run once per deploy.
+    app.config['SCHEMA_AUTO_CREATE'] = os.getenv('SCHEMA_AUTO_CREATE', 'true').lower() in ['true', '1', 't']
+    # SQLite: WAL lets readers run alongside the single writer; busy_timeout (ms) waits for locks instead of failing.
+    app.config['SQLITE_JOURNAL_MODE'] = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    # Client/server databases such as PostgreSQL: connection pool settings.
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ['true', '1', 't']
+    app.config['TICKETS_PER_PAGE'] = int(os.getenv('TICKETS_PER_PAGE', 50))
+    app.config['COMMENTS_PER_PAGE'] = int(os.getenv('COMMENTS_PER_PAGE', 50))
+    app.config['SEARCH_RESULTS_PER_PAGE'] = int(os.getenv('SEARCH_RESULTS_PER_PAGE', 20))
+    app.config['CACHE_URL'] = os.getenv('CACHE_URL')  # e.g. redis://localhost:6379/0 to share caches between workers
+    app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', 10000))
+    app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 60))  # seconds
+    # The signed-in user cache needs CACHE_URL, so a revoked account is signed out on every worker at once;
+    # a server running a single process (run.py, gunicorn -w 1) may keep it in memory instead.
+    app.config['USER_CACHE_LOCAL'] = os.getenv('USER_CACHE_LOCAL', 'false').lower() in ['true', '1', 't']
+    # Rendered dashboard rows and comment threads; bounded by entries and by total HTML size.
+    app.config['FRAGMENT_CACHE_SIZE'] = int(os.getenv('FRAGMENT_CACHE_SIZE', 5000))
+    app.config['FRAGMENT_CACHE_BYTES'] = int(os.getenv('FRAGMENT_CACHE_BYTES', 32 * 1024 * 1024))
+    app.config['FRAGMENT_CACHE_TTL'] = int(os.getenv('FRAGMENT_CACHE_TTL', 3600))  # seconds
+    app.config['SQL_INSTRUMENTATION'] = os.getenv('SQL_INSTRUMENTATION', 'false').lower() in ['true', '1', 't']
+    app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO')  # for app.logger and the app.* module loggers under it
+    # Live updates. Deployed: run `flask events serve`, proxy /events/stream to it and set
+    # EVENTS_STREAM_URL=/events/stream and EVENTS_URL; unset, pages poll the app instead.
+    app.config['EVENTS_URL'] = os.getenv('EVENTS_URL')  # e.g. redis://localhost:6379/0 to fan out across processes
+    app.config['EVENTS_STREAM_URL'] = os.getenv('EVENTS_STREAM_URL')  # same-origin path of `flask events serve`
+    app.config['EVENTS_HEARTBEAT'] = float(os.getenv('EVENTS_HEARTBEAT', 15))  # seconds between keepalives
+    app.config['EVENTS_POLL_INTERVAL'] = float(os.getenv('EVENTS_POLL_INTERVAL', 15))  # seconds, without the stream server
+    # Who new tickets are assigned to: 'least_loaded', 'round_robin', or 'none' to leave them to be claimed.
+    app.config['ASSIGNMENT_POLICY'] = os.getenv('ASSIGNMENT_POLICY', 'least_loaded')
+    # SLA targets for `flask history report`: hours allowed in each status, and from creation to resolution.
+    app.config['SLA_STATUS_HOURS'] = os.getenv('SLA_STATUS_HOURS', 'New=24,In Progress=72')
+    app.config['SLA_RESOLUTION_HOURS'] = float(os.getenv('SLA_RESOLUTION_HOURS', 120))
+    # Deadlines by priority, escalated by `flask sla escalate --every 60` on any number of nodes.
+    app.config['SLA_PRIORITY_HOURS'] = os.getenv('SLA_PRIORITY_HOURS', 'Urgent=4,High=24,Normal=72,Low=120')
+    app.config['SLA_ESCALATION_BATCH_SIZE'] = int(os.getenv('SLA_ESCALATION_BATCH_SIZE', 500))
+    # Likely duplicates shown while a ticket is written: estimated word-set similarity, 0-1.
+    app.config['DUPLICATE_THRESHOLD'] = float(os.getenv('DUPLICATE_THRESHOLD', 0.4))
+    app.config['DUPLICATE_MAX_RESULTS'] = int(os.getenv('DUPLICATE_MAX_RESULTS', 5))
+    # Attachments: bytes in a content-addressed directory, metadata in the database.
+    app.config['ATTACHMENT_DIR'] = os.getenv('ATTACHMENT_DIR', os.path.join(app.instance_path, 'attachments'))
+    app.config['ATTACHMENT_MAX_SIZE'] = int(os.getenv('ATTACHMENT_MAX_SIZE', 10 * 1024 * 1024))  # bytes per file
+    app.config['ATTACHMENT_MAX_FILES'] = int(os.getenv('ATTACHMENT_MAX_FILES', 5))  # per ticket or comment
+    app.config['ATTACHMENT_CACHE_MAX_AGE'] = int(os.getenv('ATTACHMENT_CACHE_MAX_AGE', 86400))  # seconds
+    # Whole request bodies, checked before anything is read.
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', app.config['ATTACHMENT_MAX_SIZE']
+                                                     * app.config['ATTACHMENT_MAX_FILES'] + 1024 * 1024))
+    app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() in ['true', '1', 't']  # behind Apache/lighttpd
+    app.config['ARCHIVE_DATABASE_URI'] = os.getenv('ARCHIVE_DATABASE_URI')  # default: archive tables in the main database
+    app.config['ARCHIVE_CLOSED_AFTER_DAYS'] = int(os.getenv('ARCHIVE_CLOSED_AFTER_DAYS', 90))
+    app.config['ARCHIVE_DELETED_AFTER_DAYS'] = int(os.getenv('ARCHIVE_DELETED_AFTER_DAYS', 30))
+    app.config['ARCHIVE_BATCH_SIZE'] = int(os.getenv('ARCHIVE_BATCH_SIZE', 500))
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')  # any werkzeug method
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.getenv('PASSWORD_HASH_QUEUE', 32))  # callers allowed to wait for a worker
+    app.config['PASSWORD_HASH_QUEUE_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 5))  # seconds, then 503
+    # Reverse proxies in front of the app whose X-Forwarded-For/-Proto are trusted. Without this, behind a
+    # proxy every client shares its address, and so one rate limit bucket.
+    app.config['PROXY_FIX_HOPS'] = int(os.getenv('PROXY_FIX_HOPS', 0))
+    # Token buckets per client IP and per account, as 'count/period'; an empty value turns one off.
+    app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() in ['true', '1', 't']
+    app.config['RATE_LIMIT_URL'] = os.getenv('RATE_LIMIT_URL')  # e.g. redis://localhost:6379/0 to share buckets between workers
+    app.config['RATE_LIMIT_LOGIN_IP'] = os.getenv('RATE_LIMIT_LOGIN_IP', '30/minute')
+    app.config['RATE_LIMIT_LOGIN_ACCOUNT'] = os.getenv('RATE_LIMIT_LOGIN_ACCOUNT', '10/minute')
+    app.config['RATE_LIMIT_SIGNUP_IP'] = os.getenv('RATE_LIMIT_SIGNUP_IP', '10/hour')
+    app.config['RATE_LIMIT_SIGNUP_ACCOUNT'] = os.getenv('RATE_LIMIT_SIGNUP_ACCOUNT', '3/hour')
+    app.config['RATE_LIMIT_TICKETS_IP'] = os.getenv('RATE_LIMIT_TICKETS_IP', '120/hour')
+    app.config['RATE_LIMIT_TICKETS_ACCOUNT'] = os.getenv('RATE_LIMIT_TICKETS_ACCOUNT', '30/hour')
+    # Sign-ins and sign-ups handled at once per process; the rest wait this long, then get a 503. The
+    # cap is not shared: with N worker processes (WEB_CONCURRENCY) the deployment admits N times this,
+    # which matches the hashing pool above, also one per process.
+    app.config['ADMISSION_MAX_CONCURRENT'] = int(os.getenv(
+        'ADMISSION_MAX_CONCURRENT', app.config['PASSWORD_HASH_WORKERS'] + app.config['PASSWORD_HASH_QUEUE']))
+    app.config['ADMISSION_QUEUE_TIMEOUT'] = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 1))  # seconds
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'your.smtp.server.com') #For Production Environment implement companies server details here
     app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))#For Production Environment implement companies server details here
     app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'true').lower() in ['true', '1', 't'] #For Production Environment implement companies server details here
     app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_TLS', 'false').lower() in ['true', '1', 't']#For Production Environment implement companies server details here
     app.config['MAIL_USERNAME'] = os.getenv('your email address/username')#For Production Environment implement companies server details here
     app.config['MAIL_PASSWORD'] = os.getenv('your password')#For Production Environment implement companies server details here
-
+    app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', 'helpdesk@example.com')  # system mail, e.g. SLA digests
+    app.config['MAIL_QUEUE_WORKER'] = os.getenv('MAIL_QUEUE_WORKER', 'thread')  # 'thread' or 'external' (flask mail worker)
+    app.config['MAIL_QUEUE_POLL_INTERVAL'] = float(os.getenv('MAIL_QUEUE_POLL_INTERVAL', 10))
+    app.config['MAIL_QUEUE_BATCH_SIZE'] = int(os.getenv('MAIL_QUEUE_BATCH_SIZE', 20))
+    app.config['MAIL_QUEUE_MAX_ATTEMPTS'] = int(os.getenv('MAIL_QUEUE_MAX_ATTEMPTS', 5))
+    app.config['MAIL_QUEUE_BACKOFF'] = float(os.getenv('MAIL_QUEUE_BACKOFF', 30))  # seconds, doubled per attempt
+    app.config.update(config or {})  # explicit overrides, e.g. from the benchmark harness
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', database.engine_options(app.config))
+    archive_uri = app.config['ARCHIVE_DATABASE_URI'] or app.config['SQLALCHEMY_DATABASE_URI']
+    app.config.setdefault('SQLALCHEMY_BINDS', {
+        'archive': {'url': archive_uri, **database.engine_options(app.config, archive_uri)},
+    })
+
+    if app.config['PROXY_FIX_HOPS']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'],
+                                x_proto=app.config['PROXY_FIX_HOPS'])
+
+    # app.logger is the 'app' logger, parent of every module logger here; first use gives
+    # it Flask's stderr handler unless the server has configured logging already.
+    app.logger.setLevel(app.config['LOG_LEVEL'])
 
     db.init_app(app)
+    database.init_app(app)
     login_manager.init_app(app)
-    mail.init_app(app)
+    cache.init_app(app)
+    usercache.init_app(app)
+    passwords.init_app(app)
+    ratelimit.init_app(app)
 
     login_manager.login_view = 'auth.login'
 
@@ -42,8 +150,25 @@ def create_app():
     from app.tickets import tickets as tickets_blueprint
     app.register_blueprint(tickets_blueprint, url_prefix='/tickets')
 
-    with app.app_context():
-        db.create_all()
+    from app.api import api as api_blueprint
+    app.register_blueprint(api_blueprint, url_prefix='/api/v1')
+
+    if app.config['SCHEMA_AUTO_CREATE']:
+        with app.app_context():
+            bootstrap.create_schema()
+
+    mailqueue.init_app(app)
+    events.init_app(app)
+    attachments.init_app(app)
+    similarity.init_app(app)
+    fragments.init_app(app)
+    history.init_app(app)
+    escalation.init_app(app)
+    instrumentation.init_app(app)
+
+    @app.errorhandler(passwords.PasswordHasherBusy)
+    def password_hasher_busy(error):
+        return 'Too many sign-ins at once, please try again in a moment.', 503, {'Retry-After': '5'}
 
     @app.route("/", methods=['GET'])
     def index():
@@ -58,75 +183,87 @@ def create_app():
 
     @app.route('/create_ticket', methods=['GET', 'POST'])
     @login_required
+    @rate_limited('tickets', account=lambda: current_user.id)
     def create_ticket():
+        from app.forms import TicketForm  # forms and WTForms load with the first request that needs them
+
         form = TicketForm()
         if form.validate_on_submit():
-            ticket = Ticket(title=form.title.data, description=form.description.data, creator_id=current_user.id)
-            db.session.add(ticket)
-            db.session.commit()
+            services.create_ticket(current_user, form.title.data, form.description.data, form.attachments.data,
+                                   priority=form.priority.data, category=form.category.data)
             flash('Ticket created successfully!', 'success')
 
-            try:
-                if User.query.filter_by(is_hr=True).count() > 0:
-                    sender = current_user.email
-                    hr_emails = [user.email for user in User.query.filter_by(is_hr=True).all()]
-                    msg = Message('New Ticket Created', sender=sender, recipients=hr_emails)#functionality checked in test environment
-                    msg.body = f'''
-                    Dear HR,
-
-                    A new ticket has been created with the following details:
-                    Title: {form.title.data}
-                    Description: {form.description.data}
-                    Creator: {current_user.email}
-
-                    Please check the HR dashboard for more details.
-
-                    Best regards,
-                    Your Company
-                    '''
-                    mail.send(msg)#functionality checked in test environment
-            #add exception incase there is no test server to test the functionality
-            except SMTPException as e:
-                flash(f'An error occurred while sending the email: {str(e)}', 'danger')
-            except gaierror as e:
-                flash(f'Failed to resolve SMTP server hostname: {str(e)}', 'danger')
-
             return redirect(url_for('index'))
         return render_template('associate/create_ticket.html', form=form)
 
     @app.route('/ticket/<int:ticket_id>')
     @login_required
     def view_ticket(ticket_id):
-        ticket = Ticket.query.get_or_404(ticket_id)
+        ticket = Ticket.query.filter(Ticket.id == ticket_id, Ticket.not_deleted()).first()
+        archived = ticket is None
+        if archived:  # moved out of the hot tables; still readable, no longer editable
+            ticket = find_archived_ticket(ticket_id)
+            if ticket is None or ticket.deleted_at is not None:
+                abort(404)
         if current_user.id != ticket.creator_id and not current_user.is_hr:
             flash('You are not authorized to view this ticket.', 'warning')
             return redirect(url_for('index'))
+        comment_thread = fragments.comment_thread(ticket, request.args, app.config['COMMENTS_PER_PAGE'], archived)
+        from app.forms import CommentForm, PriorityForm, StatusForm
+
         comment_form = CommentForm()
-        status_form = StatusForm()
-        return render_template('ticket_detail.html', ticket=ticket, comment_form=comment_form, status_form=status_form)
+        status_form = StatusForm(obj=ticket)
+        priority_form = PriorityForm(obj=ticket)
+        return render_template('ticket_detail.html', ticket=ticket, comment_thread=comment_thread,
+                               attachments=attachments.ticket_attachments(ticket.id), comment_form=comment_form,
+                               status_form=status_form, priority_form=priority_form, archived=archived)
 
     @app.route('/ticket/<int:ticket_id>/comment', methods=['GET', 'POST'])
     @login_required
     def add_comment(ticket_id):
+        from app.forms import CommentForm
+
         form = CommentForm()
-        ticket = Ticket.query.get_or_404(ticket_id)
+        ticket = live_ticket_or_404(ticket_id)
         if form.validate_on_submit():
             if not current_user.is_hr and current_user.id != ticket.creator_id:
                 flash('You are not authorized to comment on this ticket.', 'warning')
                 return redirect(url_for('main.index'))
-            content = form.comment.data
-            comment = Comment(content=content, ticket_id=ticket_id, author_id=current_user.id)
-            db.session.add(comment)
-            db.session.commit()
+            services.add_comment(ticket, current_user, form.comment.data, form.attachments.data)
             flash('Your comment has been added.', 'success')
             return redirect(url_for('view_ticket', ticket_id=ticket_id))
         return render_template('add_comment.html', form=form, ticket_id=ticket_id)
 
+    @app.route('/attachments/<int:attachment_id>')
+    @login_required
+    def download_attachment(attachment_id):
+        attachment = db.get_or_404(Attachment, attachment_id)
+        ticket = (Ticket.query.filter(Ticket.id == attachment.ticket_id, Ticket.not_deleted()).first()
+                  or find_archived_ticket(attachment.ticket_id))
+        if ticket is None or ticket.deleted_at is not None:
+            abort(404)
+        if current_user.id != ticket.creator_id and not current_user.is_hr:
+            abort(403)
+        return attachments.download(attachment)
+
+    @app.route('/search')
+    @login_required
+    def search_tickets():
+        query = request.args.get('q', '').strip()
+        page = max(request.args.get('page', 1, type=int), 1)
+        results, has_next = [], False
+        if query:
+            results, has_next = search.search_tickets(current_user, query, page, app.config['SEARCH_RESULTS_PER_PAGE'])
+        return render_template('search.html', query=query, results=results, page=page, has_next=has_next)
+
     @app.route('/registration', methods=['GET', 'POST'])
+    @rate_limited('signup', account=submitted_email, expensive=True)
     def registration():
+        from app.forms import RegistrationForm
+
         form = RegistrationForm()
         if form.validate_on_submit():
-            hashed_password = generate_password_hash(form.password.data)
+            hashed_password = passwords.hash_password(form.password.data)
             new_user = User(email=form.email.data, password_hash=hashed_password)
             db.session.add(new_user)
             db.session.commit()
@@ -137,25 +274,30 @@ def create_app():
     @app.route('/dashboard')
     @login_required
     def dashboard():
-        if current_user.is_hr:
-            tickets = Ticket.query.all()  # HR sees all tickets
-        else:
-            tickets = Ticket.query.filter_by(creator_id=current_user.id)  # Associates see only their tickets
-        return render_template('dashboard.html', tickets=tickets)
+        from app.forms import StatusForm
+
+        page = dashboard_page(current_user, request.args, app.config['TICKETS_PER_PAGE'])
+        return render_template('dashboard.html', tickets=page.items, page=page,
+                               status_choices=StatusForm.status_choices, ticket_statuses=TICKET_STATUSES,
+                               priorities=PRIORITIES)
 
 
 
     @app.route('/hr_signup', methods=['GET', 'POST'])
+    @rate_limited('signup', account=submitted_email, expensive=True)
     def hr_signup():
         if not current_user.is_authenticated:  # Only allow access if the user is not logged in
+            from app.forms import HRRegistrationForm
+
             form = HRRegistrationForm()
             if form.validate_on_submit():
                 try:
                     # Create a new user object with HR privileges
-                    new_user = User(email=form.email.data, password_hash=generate_password_hash(form.password.data),
+                    new_user = User(email=form.email.data, password_hash=passwords.hash_password(form.password.data),
                                     is_hr=True, is_approved=False)
                     db.session.add(new_user)  # Add the new user to the database session
                     db.session.commit()  # Commit the changes to the database
+                    invalidate_hr_recipients()
                     print("User added to the database:", new_user)  # Debug print to check if user is added
                     flash('HR registration submitted for approval.', 'info')  # Show a success message
                     return redirect(url_for('index'))  # Redirect to the index page
@@ -186,6 +328,8 @@ def create_app():
         user = User.query.get_or_404(user_id)
         user.is_approved = True
         db.session.commit()
+        invalidate_hr_recipients()
+        invalidate_user(user_id)
         flash('HR user approved.')
         return redirect(url_for('hr_approvals'))
 
@@ -204,61 +348,163 @@ def create_app():
         db.session.delete(user)
 
         db.session.commit()
+        invalidate_hr_recipients()
+        invalidate_user(user_id)
 
         flash('HR approval disapproved and request deleted successfully!', 'success')
 
         return redirect(url_for('hr_approvals'))
 
+    @app.route('/admin/hr_approvals/bulk', methods=['POST'])
+    @login_required
+    def bulk_review_hr():
+        if not current_user.is_admin:
+            return redirect(url_for('index'))
+        decision = request.form.get('decision')
+        if decision not in ('approve', 'reject'):
+            flash('Choose approve or reject.', 'danger')
+            return redirect(url_for('hr_approvals'))
+        user_ids = None if request.form.get('scope') == 'all' else request.form.getlist('user_ids', type=int)
+        if user_ids == []:
+            flash('No HR requests selected.', 'warning')
+            return redirect(url_for('hr_approvals'))
+        result = services.bulk_review_hr(decision == 'approve', user_ids)
+        flash(bulk_summary(result, 'approved' if decision == 'approve' else 'rejected',
+                           'not pending'), 'success')
+        return redirect(url_for('hr_approvals'))
+
+    @app.route('/stats')
+    @login_required
+    def ticket_stats():
+        if not (current_user.is_hr or current_user.is_admin):
+            return redirect(url_for('index'))
+        return render_template('stats.html', stats=stats.ticket_statistics())
+
+    @app.route('/admin/cache_stats')
+    @login_required
+    def cache_stats():
+        if not current_user.is_admin:
+            return redirect(url_for('index'))
+        return jsonify(cache.cache_stats())
+
     @app.route('/ticket/<int:ticket_id>/change_status', methods=['POST'])
     @login_required
     def change_status(ticket_id):
-        ticket = Ticket.query.get_or_404(ticket_id)
-        if current_user.is_hr:  # Only HR should be able to change the status
-            new_status = request.form.get('status')
-            ticket.status = new_status
-            db.session.commit()
+        ticket = live_ticket_or_404(ticket_id)
+        if not current_user.is_hr:  # Only HR should be able to change the status
+            flash('You are not authorized to change the status of this ticket.', 'danger')
+        elif request.form.get('status') not in TICKET_STATUSES:
+            flash('Choose a valid status.', 'danger')
+        else:
+            services.change_status(ticket, request.form['status'], current_user)
             flash('Status updated successfully!', 'success')
+        return redirect(url_for('view_ticket', ticket_id=ticket_id))
+
+    @app.route('/ticket/<int:ticket_id>/change_priority', methods=['POST'])
+    @login_required
+    def change_priority(ticket_id):
+        from app.forms import PriorityForm
+
+        ticket = live_ticket_or_404(ticket_id)
+        form = PriorityForm()
+        if not current_user.is_hr:  # Only HR set priorities; associates choose one when filing
+            flash('You are not authorized to change the priority of this ticket.', 'danger')
+        elif form.validate_on_submit():
+            services.change_priority(ticket, form.priority.data)
+            flash('Priority updated successfully!', 'success')
         else:
-            flash('You are not authorized to change the status of this ticket.', 'danger')
+            flash('Choose a valid priority.', 'danger')
         return redirect(url_for('view_ticket', ticket_id=ticket_id))
 
+    @app.route('/bulk_change_status', methods=['POST'])
+    @login_required
+    def bulk_change_status():
+        filters = {'status': request.form.get('filter_status') or None,
+                   'creator': request.form.get('filter_creator') or None,
+                   'assignee': request.form.get('filter_assignee') or None,
+                   'priority': request.form.get('filter_priority') or None}
+        back = redirect(url_for('dashboard', **filters))
+        if not current_user.is_hr:  # Only HR should be able to change the status
+            flash('You are not authorized to change the status of these tickets.', 'danger')
+            return back
+        new_status = request.form.get('status')
+        if new_status not in TICKET_STATUSES:
+            flash('Choose a valid status.', 'danger')
+            return back
+        if request.form.get('scope') == 'filter':
+            creator_id, current_status, assignee, priority = dashboard_filters(current_user, filters)
+            result = services.bulk_change_status(new_status, creator_id=creator_id, current_status=current_status,
+                                                  actor=current_user, assignee=assignee, priority=priority)
+        else:
+            ticket_ids = request.form.getlist('ticket_ids', type=int)
+            if not ticket_ids:
+                flash('No tickets selected.', 'warning')
+                return back
+            result = services.bulk_change_status(new_status, ticket_ids, actor=current_user)
+        flash(bulk_summary(result, f'moved to {new_status}', f'already {new_status}'), 'success')
+        return back
+
+    @app.route('/claim_next', methods=['POST'])
+    @login_required
+    def claim_next_ticket():
+        if not current_user.is_hr:
+            flash('You are not authorized to claim tickets.', 'danger')
+            return redirect(url_for('dashboard'))
+        ticket = services.claim_next_ticket(current_user)
+        if ticket is None:
+            flash('There are no unassigned open tickets.', 'info')
+            return redirect(url_for('dashboard'))
+        flash(f'Ticket #{ticket.id} is now assigned to you.', 'success')
+        return redirect(url_for('view_ticket', ticket_id=ticket.id))
+
     @app.route('/delete_ticket/<int:ticket_id>', methods=['POST'])
     @login_required
     def delete_ticket(ticket_id):
-        ticket = Ticket.query.get_or_404(ticket_id)
+        ticket = live_ticket_or_404(ticket_id)
         if current_user.is_hr or current_user.id == ticket.creator_id:
-            db.session.delete(ticket)
-            db.session.commit()
+            services.delete_ticket(ticket, current_user)
             flash('Ticket deleted successfully!', 'success')
         else:
             flash('You are not authorized to delete this ticket.', 'warning')
         return redirect(url_for('dashboard'))
 
-    migrate = Migrate(app, db)
+    if click.get_current_context(silent=True) is not None or 'flask_migrate' in sys.modules:
+        # Only the `flask` command line (or a script that already loaded Flask-Migrate)
+        # needs it, and importing it pulls in Alembic, most of this package's import time.
+        from flask_migrate import Migrate
+        Migrate(app, db, include_object=include_object)
+    bootstrap.init_app(app)
+    app.cli.add_command(search.search_reindex)
+    app.cli.add_command(stats.stats_cli)
+    # Command-line only: imported when the command runs, never by a web worker.
+    app.cli.add_lazy_command('check-indexes', 'app.explain:check_indexes')
+    app.cli.add_lazy_command('bench', 'app.benchmark:bench')
+    app.cli.add_lazy_command('bench-startup', 'app.benchmark:bench_startup')
+    app.cli.add_lazy_command('tickets', 'app.transfer:tickets_cli')
+    app.cli.add_lazy_command('archive', 'app.archive:archive_cli')
     return app
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # Tables created outside the migrations, which autogenerate must leave alone.
+    from app import archive
+
+    return (search.include_object(object, name, type_, reflected, compare_to)
+            and archive.include_object(object, name, type_, reflected, compare_to))
+
+
+def bulk_summary(result, done, unchanged):
+    parts = [f"{len(result['updated'])} {done}"]
+    if result['unchanged']:
+        parts.append(f"{len(result['unchanged'])} {unchanged}")
+    if result['not_found']:
+        parts.append('not found: ' + ', '.join(map(str, result['not_found'])))
+    return '; '.join(parts) + '.'
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
-
-def create_admin():
-    admin_email = 'admin@example.com'
-    admin_password = 'secure_admin_password'
-    existing_admin = User.query.filter_by(email=admin_email).first()
-
-    if not existing_admin:
-        admin_user = User(
-            email=admin_email,
-            password_hash=generate_password_hash(admin_password, method='pbkdf2:sha256'),
-            is_admin=True  # Assuming your User model has an 'is_admin' field
-        )
-        db.session.add(admin_user)
-        db.session.commit()
-        print("Admin user created.")
-    else:
-        print("Admin user already exists.")
-
+    return load_cached_user(int(user_id))
 
 def hr_required(f):
     @wraps(f)
@@ -0,0 +1,325 @@
+import hashlib
+from datetime import timezone
+
+from flask import Blueprint, abort, current_app, jsonify, request, url_for
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+
+from app import attachments, services, similarity
+from app.extension import db
+from app.models import PRIORITIES, Ticket, TICKET_CATEGORIES, TICKET_STATUSES, User
+from app.queries import UNASSIGNED, assignee_criterion, comment_page, dashboard_filters, keyset_page
+from app.ratelimit import rate_limited
+
+
+api = Blueprint('api', __name__)
+
+TICKET_FIELDS = {
+    'id': Ticket.id,
+    'title': Ticket.title,
+    'description': Ticket.description,
+    'status': Ticket.status,
+    'priority': Ticket.priority,
+    'category': Ticket.category,
+    'creator_id': Ticket.creator_id,
+    'assignee_id': Ticket.assignee_id,
+    'created_at': Ticket.created_at,
+    'updated_at': Ticket.updated_at,
+    'due_at': Ticket.due_at,
+    'escalated_at': Ticket.escalated_at,
+}
+DEFAULT_LIST_FIELDS = ('id', 'title', 'status', 'priority', 'creator_id', 'updated_at')
+MAX_LIMIT = 100
+
+
+def _error(status, message):
+    response = jsonify(error=message)
+    response.status_code = status
+    return response
+
+
+@api.errorhandler(HTTPException)
+def handle_http_error(error):
+    response = _error(error.code, error.description)
+    response.headers.extend((name, value) for name, value in error.get_headers() if name == 'Retry-After')
+    return response
+
+
+@api.before_request
+def require_login():
+    if not current_user.is_authenticated:
+        return _error(401, 'Authentication required.')
+
+
+def _timestamp(value):
+    return value.isoformat(timespec='microseconds') + 'Z' if value else None
+
+
+def _serialize(row, fields):
+    return {field: _timestamp(getattr(row, field)) if field.endswith('_at') else getattr(row, field)
+            for field in fields}
+
+
+def _requested_fields(default):
+    # Sparse fieldsets: ?fields=id,title only selects those columns.
+    if not request.args.get('fields'):
+        return list(default)
+    fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+    unknown = set(fields) - set(TICKET_FIELDS)
+    if unknown:
+        abort(400, f"Unknown fields: {', '.join(sorted(unknown))}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')  # needed for cursors and links
+    return fields
+
+
+def _etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _conditional(etag, last_modified):
+    """Return a 304 response if the client's copy is current, else None."""
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = (since is not None and last_modified is not None
+                        and last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= since)
+    if not not_modified:
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return response
+
+
+def _with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # always revalidate, which is cheap
+    return response
+
+
+def _visible_ticket_header(ticket_id):
+    # Just enough of the row to authorize and build validators, so a 304 never
+    # loads the description or comments.
+    header = db.session.query(Ticket.id, Ticket.creator_id, Ticket.updated_at).filter(
+        Ticket.id == ticket_id, Ticket.not_deleted()).first()
+    if header is None:
+        return None, _error(404, 'Ticket not found.')
+    if current_user.id != header.creator_id and not current_user.is_hr:
+        return None, _error(403, 'You are not authorized to view this ticket.')
+    return header, None
+
+
+def _limit():
+    return max(1, min(request.args.get('limit', current_app.config['TICKETS_PER_PAGE'], type=int), MAX_LIMIT))
+
+
+@api.route('/tickets', methods=['GET'])
+def list_tickets():
+    fields = _requested_fields(DEFAULT_LIST_FIELDS)
+    query = db.session.query(*(TICKET_FIELDS[field] for field in fields)).filter(Ticket.not_deleted())
+    if not current_user.is_hr:
+        query = query.filter(Ticket.creator_id == current_user.id)
+    elif request.args.get('creator'):
+        creator = db.session.query(User.id).filter_by(email=request.args['creator']).first()
+        query = query.filter(Ticket.creator_id == (creator.id if creator else -1))
+    if request.args.get('status'):
+        query = query.filter(Ticket.status == request.args['status'])
+    if request.args.get('priority'):
+        query = query.filter(Ticket.priority == request.args['priority'])
+    if current_user.is_hr and request.args.get('assignee'):  # 'me', 'unassigned' or a user id
+        assignee = request.args['assignee']
+        if assignee not in ('me', UNASSIGNED) and not assignee.isdigit():
+            return _error(400, "assignee must be 'me', 'unassigned' or a user id.")
+        query = query.filter(assignee_criterion(
+            current_user.id if assignee == 'me' else assignee if assignee == UNASSIGNED else int(assignee)))
+    page = keyset_page(query, Ticket.id, _limit(),
+                       after=request.args.get('after', type=int), before=request.args.get('before', type=int))
+    body = {
+        'items': [_serialize(row, fields) for row in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    }
+    response = jsonify(body)
+    # Lists are validated by content: cheap to compare and exact for any filter.
+    etag = hashlib.sha1(response.get_data()).hexdigest()
+    not_modified = _conditional(etag, None)
+    return not_modified or _with_validators(response, etag, None)
+
+
+@api.route('/tickets', methods=['POST'])
+@rate_limited('tickets', account=lambda: current_user.id)
+def create_ticket():
+    data = request.get_json(silent=True) or {}
+    title, description = (data.get('title') or '').strip(), (data.get('description') or '').strip()
+    if not title or not description:
+        return _error(400, 'Both title and description are required.')
+    if len(title) > Ticket.title.type.length:
+        return _error(400, f'Title must be at most {Ticket.title.type.length} characters.')
+    priority, category = data.get('priority', 'Normal'), data.get('category', 'Other')
+    if priority not in PRIORITIES:
+        return _error(400, f"priority must be one of: {', '.join(PRIORITIES)}")
+    if category not in TICKET_CATEGORIES:
+        return _error(400, f"category must be one of: {', '.join(TICKET_CATEGORIES)}")
+    ticket = services.create_ticket(current_user, title, description, priority=priority, category=category)
+    response = jsonify(_serialize(ticket, TICKET_FIELDS))
+    response.status_code = 201
+    response.headers['Location'] = f'{request.base_url}/{ticket.id}'
+    return _with_validators(response, _etag(ticket.id, ticket.updated_at, ','.join(TICKET_FIELDS)), ticket.updated_at)
+
+
+@api.route('/tickets/similar', methods=['GET'])
+def similar_tickets():
+    # Called as the ticket form is filled in, so the likely duplicates show before submitting.
+    matches = similarity.similar_tickets(current_user, request.args.get('title', ''),
+                                         request.args.get('description', ''))
+    return jsonify({'items': [{**match._asdict(), 'url': url_for('view_ticket', ticket_id=match.id)}
+                              for match in matches]})
+
+
+@api.route('/tickets/claim', methods=['POST'])
+def claim_ticket():
+    if not current_user.is_hr:
+        return _error(403, 'You are not authorized to claim tickets.')
+    ticket = services.claim_next_ticket(current_user)
+    if ticket is None:
+        return current_app.response_class(status=204)  # nothing left to claim
+    return _with_validators(jsonify(_serialize(ticket, TICKET_FIELDS)),
+                            _etag(ticket.id, ticket.updated_at, ','.join(TICKET_FIELDS)), ticket.updated_at)
+
+
+@api.route('/tickets/<int:ticket_id>', methods=['GET'])
+def get_ticket(ticket_id):
+    fields = _requested_fields(TICKET_FIELDS)
+    header, error = _visible_ticket_header(ticket_id)
+    if error:
+        return error
+    etag = _etag(header.id, header.updated_at, ','.join(fields))
+    not_modified = _conditional(etag, header.updated_at)
+    if not_modified:
+        return not_modified
+    row = db.session.query(*(TICKET_FIELDS[field] for field in fields)).filter(Ticket.id == ticket_id).one()
+    return _with_validators(jsonify(_serialize(row, fields)), etag, header.updated_at)
+
+
+@api.route('/tickets/<int:ticket_id>', methods=['PATCH'])
+def update_ticket_status(ticket_id):
+    if not current_user.is_hr:  # Only HR should be able to change the status
+        return _error(403, 'You are not authorized to change the status of this ticket.')
+    ticket = Ticket.query.filter(Ticket.id == ticket_id, Ticket.not_deleted()).first()
+    if ticket is None:
+        return _error(404, 'Ticket not found.')
+    data = request.get_json(silent=True) or {}
+    status, priority = data.get('status'), data.get('priority')
+    if status is None and priority is None:
+        return _error(400, 'Give a status, a priority, or both.')
+    if status is not None and status not in TICKET_STATUSES:
+        return _error(400, f"status must be one of: {', '.join(TICKET_STATUSES)}")
+    if priority is not None and priority not in PRIORITIES:
+        return _error(400, f"priority must be one of: {', '.join(PRIORITIES)}")
+    # Optional optimistic concurrency: If-Match must name the current version.
+    if request.if_match and not request.if_match.contains(
+            _etag(ticket.id, ticket.updated_at, ','.join(TICKET_FIELDS))):
+        return _error(412, 'The ticket has changed since it was read.')
+    if priority is not None:
+        services.change_priority(ticket, priority)
+    if status is not None:
+        services.change_status(ticket, status, current_user)
+    return _with_validators(jsonify(_serialize(ticket, TICKET_FIELDS)),
+                            _etag(ticket.id, ticket.updated_at, ','.join(TICKET_FIELDS)), ticket.updated_at)
+
+
+@api.route('/tickets/bulk_status', methods=['POST'])
+def bulk_update_status():
+    if not current_user.is_hr:
+        return _error(403, 'You are not authorized to change the status of these tickets.')
+    data = request.get_json(silent=True) or {}
+    status = data.get('status')
+    if status not in TICKET_STATUSES:
+        return _error(400, f"status must be one of: {', '.join(TICKET_STATUSES)}")
+    if 'filter' in data:
+        creator_id, current_status, assignee, priority = dashboard_filters(current_user, data['filter'] or {})
+        result = services.bulk_change_status(status, creator_id=creator_id, current_status=current_status,
+                                             actor=current_user, assignee=assignee, priority=priority)
+    elif isinstance(data.get('ids'), list) and all(isinstance(id, int) for id in data['ids']):
+        result = services.bulk_change_status(status, data['ids'], actor=current_user)
+    else:
+        return _error(400, 'Give either a list of integer ids or a filter.')
+    return jsonify(result)
+
+
+def _serialize_comment(comment):
+    return {'id': comment.id, 'author_id': comment.author_id, 'author_email': comment.author.email,
+            'content': comment.content}
+
+
+@api.route('/tickets/<int:ticket_id>/comments', methods=['GET'])
+def list_comments(ticket_id):
+    header, error = _visible_ticket_header(ticket_id)
+    if error:
+        return error
+    # A new comment bumps the ticket's updated_at, so it validates the thread too.
+    etag = _etag('comments', header.id, header.updated_at, request.query_string.decode())
+    not_modified = _conditional(etag, header.updated_at)
+    if not_modified:
+        return not_modified
+    page = comment_page(ticket_id, request.args, _limit())
+    response = jsonify({
+        'items': [_serialize_comment(comment) for comment in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    })
+    return _with_validators(response, etag, header.updated_at)
+
+
+@api.route('/tickets/<int:ticket_id>/comments', methods=['POST'])
+def create_comment(ticket_id):
+    ticket = Ticket.query.filter(Ticket.id == ticket_id, Ticket.not_deleted()).first()
+    if ticket is None:
+        return _error(404, 'Ticket not found.')
+    if not current_user.is_hr and current_user.id != ticket.creator_id:
+        return _error(403, 'You are not authorized to comment on this ticket.')
+    content = ((request.get_json(silent=True) or {}).get('content') or '').strip()
+    if not content:
+        return _error(400, 'content is required.')
+    comment = services.add_comment(ticket, current_user, content)
+    response = jsonify(_serialize_comment(comment))
+    response.status_code = 201
+    return response
+
+
+def _serialize_attachment(attachment):
+    return {'id': attachment.id, 'comment_id': attachment.comment_id, 'filename': attachment.filename,
+            'content_type': attachment.content_type, 'size': attachment.size, 'sha256': attachment.sha256,
+            'url': url_for('download_attachment', attachment_id=attachment.id)}
+
+
+@api.route('/tickets/<int:ticket_id>/attachments', methods=['GET'])
+def list_attachments(ticket_id):
+    header, error = _visible_ticket_header(ticket_id)
+    if error:
+        return error
+    rows = attachments.ticket_attachments(ticket_id, with_comments=True)
+    return jsonify({'items': [_serialize_attachment(attachment) for attachment in rows]})
+
+
+@api.route('/tickets/<int:ticket_id>/attachments', methods=['POST'])
+def upload_attachments(ticket_id):
+    # multipart/form-data with one or more `file` parts.
+    ticket = Ticket.query.filter(Ticket.id == ticket_id, Ticket.not_deleted()).first()
+    if ticket is None:
+        return _error(404, 'Ticket not found.')
+    if not current_user.is_hr and current_user.id != ticket.creator_id:
+        return _error(403, 'You are not authorized to add attachments to this ticket.')
+    files = [upload for upload in request.files.getlist('file') if upload.filename]
+    if not files:
+        return _error(400, 'Send at least one file in a `file` form field.')
+    rows = services.add_attachments(ticket, current_user, files)
+    response = jsonify({'items': [_serialize_attachment(attachment) for attachment in rows]})
+    response.status_code = 201
+    return response
@@ -0,0 +1,130 @@
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, func, insert, or_, select, tuple_
+
+from app import similarity
+from app.extension import db
+from app.models import ArchivedComment, ArchivedTicket, Comment, Ticket, User
+
+
+archive_cli = AppGroup('archive', help='Archive tier for old finished and deleted tickets.')
+
+ARCHIVE_TABLES = ('archived_ticket', 'archived_comment')
+ARCHIVABLE_STATUSES = ('Resolved', 'Closed')  # finished either way; archived tickets are read-only
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # The archive tables belong to the 'archive' bind, which create_all() sets up;
+    # keep autogenerate from dropping them when that bind is the main database.
+    return not (type_ == 'table' and name in ARCHIVE_TABLES)
+
+
+def archivable_ids(closed_before, deleted_before, limit):
+    """Ids of the next batch: finished and untouched since `closed_before`, or deleted before `deleted_before`."""
+    # The newest ticket always stays: SQLite hands the highest deleted id out again.
+    newest = select(func.max(Ticket.id)).scalar_subquery()
+    return db.session.scalars(
+        select(Ticket.id)
+        .where(or_(and_(Ticket.status.in_(ARCHIVABLE_STATUSES), Ticket.updated_at < closed_before,
+                        Ticket.not_deleted()),
+                   Ticket.deleted_at < deleted_before),
+               Ticket.id < newest)
+        .order_by(Ticket.id).limit(limit)).all()
+
+
+def _unchanged(tickets):
+    # Rows still as they were read; any change to a ticket bumps its updated_at.
+    live = [(ticket['id'], ticket['updated_at']) for ticket in tickets if ticket['deleted_at'] is None]
+    deleted = [(ticket['id'], ticket['updated_at'], ticket['deleted_at'])
+               for ticket in tickets if ticket['deleted_at'] is not None]
+    return or_(and_(tuple_(Ticket.id, Ticket.updated_at).in_(live), Ticket.not_deleted()),
+               tuple_(Ticket.id, Ticket.updated_at, Ticket.deleted_at).in_(deleted))
+
+
+def archive_batch(ids):
+    """Copy tickets `ids` and their comments into the archive, then delete them from the hot tables.
+
+    The copy commits before the delete, so the two binds never hold write locks at
+    once; rerunning after a crash in between simply copies the batch again. Only
+    what was copied is deleted: a ticket reopened, commented on or otherwise
+    changed in between stays live and its copy is dropped from the archive again
+    (a crash before that leaves a stale copy, replaced when the ticket is next
+    archived). Returns the (tickets, comments) actually moved.
+    """
+    creator = User.__table__.alias('creator')
+    tickets = db.session.execute(
+        select(Ticket.id, Ticket.title, Ticket.description, Ticket.status, Ticket.creator_id,
+               creator.c.email.label('creator_email'), Ticket.created_at, Ticket.updated_at, Ticket.deleted_at,
+               Ticket.priority, Ticket.category, Ticket.assignee_id, Ticket.due_at, Ticket.sla_started_at,
+               Ticket.escalated_at)
+        .join(creator, creator.c.id == Ticket.creator_id, isouter=True)
+        .where(Ticket.id.in_(ids))).mappings().all()
+    comments = db.session.execute(
+        select(Comment.id.label('comment_id'), Comment.ticket_id, Comment.author_id,
+               User.email.label('author_email'), Comment.content)
+        .join(User, User.id == Comment.author_id, isouter=True)
+        .where(Comment.ticket_id.in_(ids)).order_by(Comment.id)).mappings().all()
+    db.session.commit()
+    if not tickets:
+        return 0, 0
+
+    archived_at = datetime.utcnow()
+    db.session.execute(delete(ArchivedComment).where(ArchivedComment.ticket_id.in_(ids)))
+    db.session.execute(delete(ArchivedTicket).where(ArchivedTicket.id.in_(ids)))
+    db.session.execute(insert(ArchivedTicket), [{**ticket, 'archived_at': archived_at} for ticket in tickets])
+    if comments:
+        db.session.execute(insert(ArchivedComment), [dict(comment) for comment in comments])
+    db.session.commit()
+
+    # Lock the tickets that are still unchanged (a no-op on SQLite, where the first
+    # DELETE takes the database write lock instead) so both deletes see the same rows.
+    # Comments posted since the read have higher ids than anything copied.
+    unchanged = _unchanged(tickets)
+    db.session.execute(select(Ticket.id).where(Ticket.id.in_(ids), unchanged).with_for_update())
+    last_copied = max((comment['comment_id'] for comment in comments), default=0)
+    db.session.execute(delete(Comment).where(
+        Comment.ticket_id.in_(select(Ticket.id).where(Ticket.id.in_(ids), unchanged)),
+        Comment.id <= last_copied))
+    # Hard delete; the full-text triggers drop the rows from the search index too.
+    moved = set(db.session.scalars(delete(Ticket).where(Ticket.id.in_(ids), unchanged).returning(Ticket.id)))
+    similarity.remove_tickets(sorted(moved))
+    db.session.commit()
+
+    changed = [ticket['id'] for ticket in tickets if ticket['id'] not in moved]
+    if changed:
+        db.session.execute(delete(ArchivedComment).where(ArchivedComment.ticket_id.in_(changed)))
+        db.session.execute(delete(ArchivedTicket).where(ArchivedTicket.id.in_(changed)))
+        db.session.commit()
+    return len(moved), sum(1 for comment in comments if comment['ticket_id'] in moved)
+
+
+def run_archiver(closed_after, deleted_after, batch_size, pause=0):
+    """Archive everything currently eligible, one batch per transaction; returns (tickets, comments)."""
+    now = datetime.utcnow()
+    closed_before, deleted_before = now - timedelta(days=closed_after), now - timedelta(days=deleted_after)
+    totals = [0, 0]
+    while ids := archivable_ids(closed_before, deleted_before, batch_size):
+        tickets, comments = archive_batch(ids)
+        totals = [totals[0] + tickets, totals[1] + comments]
+        time.sleep(pause)  # lets the request handlers in between batches
+    return tuple(totals)
+
+
+@archive_cli.command('run')
+@click.option('--batch-size', type=int, help='Tickets per batch (default ARCHIVE_BATCH_SIZE).')
+@click.option('--pause', default=0.1, show_default=True, help='Seconds to wait between batches.')
+@click.option('--every', type=float, help='Keep running, starting a new pass every this many seconds.')
+def run_command(batch_size, pause, every):
+    """Move old resolved or closed tickets and soft-deleted tickets into the archive tables."""
+    config = current_app.config
+    while True:
+        tickets, comments = run_archiver(config['ARCHIVE_CLOSED_AFTER_DAYS'], config['ARCHIVE_DELETED_AFTER_DAYS'],
+                                         batch_size or config['ARCHIVE_BATCH_SIZE'], pause)
+        click.echo(f'Archived {tickets} tickets and {comments} comments.')
+        if not every:
+            break
+        time.sleep(every)
@@ -0,0 +1,66 @@
+from flask import current_app
+from sqlalchemy import func, select, update
+
+from app.extension import db
+from app.models import OPEN_STATUSES, Ticket
+from app.recipients import hr_assignees
+
+
+# Who a new ticket goes to is decided by the policy named in ASSIGNMENT_POLICY.
+# A policy is a callable taking the candidate HR ids (ascending, never empty) and
+# returning one of them; register_policy() adds more.
+
+def _open(*criteria):
+    return [Ticket.not_deleted(), Ticket.status.in_(OPEN_STATUSES), *criteria]
+
+
+def round_robin(candidates):
+    """The next HR user after whoever received the latest assigned ticket."""
+    last = db.session.scalar(select(Ticket.assignee_id).where(Ticket.assignee_id.is_not(None))
+                             .order_by(Ticket.id.desc()).limit(1))
+    return next((id for id in candidates if last is None or id > last), candidates[0])
+
+
+def least_loaded(candidates):
+    """The HR user with the fewest open tickets; ties go to the lowest id."""
+    loads = dict(db.session.execute(select(Ticket.assignee_id, func.count())
+                                    .where(*_open(Ticket.assignee_id.in_(candidates)))
+                                    .group_by(Ticket.assignee_id)).all())
+    return min(candidates, key=lambda id: (loads.get(id, 0), id))
+
+
+POLICIES = {'round_robin': round_robin, 'least_loaded': least_loaded}
+
+
+def register_policy(name, policy):
+    POLICIES[name] = policy
+
+
+def choose_assignee():
+    """The HR user id a new ticket goes to, or None to leave it in the unassigned pool."""
+    name = current_app.config['ASSIGNMENT_POLICY']
+    if name == 'none':
+        return None
+    candidates = hr_assignees()
+    return POLICIES[name](candidates) if candidates else None
+
+
+def claim_next(user_id, attempts=5):
+    """Assign the oldest open unassigned ticket to `user_id` and return its id (None if there is none).
+
+    A single conditional UPDATE: the row only changes hands if it is still
+    unassigned, so two claimers can never both win it; the loser simply tries the
+    next one. On PostgreSQL the candidate is picked with FOR UPDATE SKIP LOCKED so
+    concurrent claimers step past each other's rows instead of queueing on them.
+    Does not commit.
+    """
+    unassigned = _open(Ticket.assignee_id.is_(None))
+    oldest = (select(Ticket.id).where(*unassigned).order_by(Ticket.id).limit(1)
+              .with_for_update(skip_locked=True).scalar_subquery())
+    statement = (update(Ticket).where(Ticket.id == oldest, Ticket.assignee_id.is_(None))
+                 .values(assignee_id=user_id).returning(Ticket.id))
+    for _ in range(attempts):
+        claimed = db.session.execute(statement, execution_options={'synchronize_session': False}).scalar()
+        if claimed is not None or db.session.scalar(select(Ticket.id).where(*unassigned).limit(1)) is None:
+            return claimed
+    return None
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import tempfile
+import time
+
+import click
+from flask import current_app, send_file
+from flask.cli import AppGroup
+from sqlalchemy import select
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+from app.extension import db
+from app.models import Attachment
+
+
+# Content-addressed store: each distinct upload is written once, to
+# <ATTACHMENT_DIR>/ab/cd/<sha256>, and any number of Attachment rows point at it.
+# Uploads are copied in fixed-size chunks from werkzeug's spooled temporary file,
+# hashed on the way, so no upload is ever held in memory whole.
+
+attachments_cli = AppGroup('attachments', help='Attachment storage maintenance.')
+
+CHUNK_SIZE = 64 * 1024
+INLINE_TYPES = ('image/png', 'image/jpeg', 'image/gif', 'text/plain')  # shown in the browser; the rest download
+
+
+def _root():
+    return current_app.config['ATTACHMENT_DIR']
+
+
+def blob_path(sha256):
+    return os.path.join(_root(), sha256[:2], sha256[2:4], sha256)
+
+
+def _store(upload, max_size):
+    """Copy one FileStorage into the store; returns (sha256, size)."""
+    incoming = os.path.join(_root(), 'incoming')
+    os.makedirs(incoming, exist_ok=True)
+    digest, size = hashlib.sha256(), 0
+    fd, temp = tempfile.mkstemp(dir=incoming)  # same filesystem, so the rename below is atomic
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while chunk := upload.stream.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise RequestEntityTooLarge(f'{upload.filename} is larger than {max_size} bytes.')
+                digest.update(chunk)
+                out.write(chunk)
+        sha256 = digest.hexdigest()
+        path = blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(temp)  # already stored
+            os.utime(path)  # and not unreferenced-and-old, as far as `prune` is concerned
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    return sha256, size
+
+
+def store_uploads(uploads):
+    """Store the non-empty uploads among `uploads` and return their metadata.
+
+    Call before any database work, so that a rejected file leaves nothing
+    half-written; attachment_rows() turns the result into rows once the ticket
+    or comment has an id.
+    """
+    config = current_app.config
+    uploads = [upload for upload in uploads or () if upload and upload.filename]
+    if len(uploads) > config['ATTACHMENT_MAX_FILES']:
+        raise BadRequest(f"At most {config['ATTACHMENT_MAX_FILES']} attachments at a time.")
+    stored = []
+    for upload in uploads:
+        sha256, size = _store(upload, config['ATTACHMENT_MAX_SIZE'])
+        stored.append({'filename': secure_filename(upload.filename) or 'attachment',
+                       'content_type': (upload.mimetype or 'application/octet-stream')[:100],
+                       'sha256': sha256, 'size': size})
+    return stored
+
+
+def attachment_rows(stored, uploader, ticket_id, comment_id=None):
+    """Add Attachment rows for store_uploads() results to the session; does not commit."""
+    rows = [Attachment(ticket_id=ticket_id, comment_id=comment_id, uploader_id=uploader.id, **meta)
+            for meta in stored]
+    db.session.add_all(rows)
+    return rows
+
+
+def ticket_attachments(ticket_id, with_comments=False):
+    """Files attached to the ticket itself, and with `with_comments` those on its comments too."""
+    query = select(Attachment).where(Attachment.ticket_id == ticket_id).order_by(Attachment.id)
+    if not with_comments:
+        query = query.where(Attachment.comment_id.is_(None))
+    return db.session.scalars(query).all()
+
+
+def comment_attachments(comment_ids):
+    """{comment_id: [Attachment, ...]} for one page of a thread, in a single query."""
+    by_comment = {}
+    if comment_ids:
+        for attachment in db.session.scalars(select(Attachment).where(Attachment.comment_id.in_(comment_ids))
+                                             .order_by(Attachment.id)):
+            by_comment.setdefault(attachment.comment_id, []).append(attachment)
+    return by_comment
+
+
+def download(attachment):
+    """Stream a stored file back: Range requests, ETag/Last-Modified revalidation, and
+    zero-copy sendfile where the server supports it (or X-Sendfile, see USE_X_SENDFILE)."""
+    inline = attachment.content_type in INLINE_TYPES
+    response = send_file(blob_path(attachment.sha256), mimetype=attachment.content_type,
+                         as_attachment=not inline, download_name=attachment.filename,
+                         conditional=True, etag=attachment.sha256, max_age=None)
+    # The bytes behind an attachment id never change, but they are not public.
+    response.cache_control.no_cache = None  # send_file's default when max_age is None
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['ATTACHMENT_CACHE_MAX_AGE']
+    response.cache_control.immutable = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+@attachments_cli.command('prune')
+@click.option('--dry-run', is_flag=True, help='Only report what would be removed.')
+def prune_command(dry_run):
+    """Remove stored files no attachment refers to, and abandoned partial uploads."""
+    root = _root()
+    removed = 0
+    for directory, _, names in os.walk(root):
+        incoming = os.path.basename(directory) == 'incoming'
+        if not incoming and names:
+            referenced = set(db.session.scalars(select(Attachment.sha256).where(Attachment.sha256.in_(names))))
+        for name in names:
+            path = os.path.join(directory, name)
+            # Give in-flight uploads an hour; their rows are written after the file.
+            if os.path.getmtime(path) > time.time() - 3600:
+                continue
+            if incoming or name not in referenced:
+                removed += 1
+                if not dry_run:
+                    os.remove(path)
+    click.echo(f"{'Would remove' if dry_run else 'Removed'} {removed} files.")
+
+
+def init_app(app):
+    app.cli.add_command(attachments_cli)
@@ -1,17 +1,20 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_user, logout_user, login_required, current_user
 from .models import User
-from . import db, HRRegistrationForm
-from forms import LoginForm
+from .passwords import check_user_password, hash_password
+from .ratelimit import rate_limited, submitted_email
+from . import db
 auth = Blueprint('auth', __name__)
 
 @auth.route('/login', methods=['GET', 'POST'])
+@rate_limited('login', account=submitted_email, expensive=True)
 def login():
+    from .forms import LoginForm  # WTForms loads with the first request that needs it
+
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
-        if user and user.check_password(form.password.data):
+        if user and check_user_password(user, form.password.data):
             if user.is_hr and user.is_approved:  # Check if user is an approved HR
                 login_user(user)
                 flash('Login successful.', 'success')
@@ -32,6 +35,7 @@ def login():
     # return render_template('login.html')
 
 @auth.route('/signup', methods=['GET', 'POST'])
+@rate_limited('signup', account=submitted_email, expensive=True)
 def signup():
     if request.method == 'POST':
         email = request.form.get('email')
@@ -40,7 +44,7 @@ def signup():
         if user:
             flash('Email address already exists')
             return redirect(url_for('auth.signup'))
-        new_user = User(email=email, password_hash=generate_password_hash(password, method='pbkdf2:sha256'))
+        new_user = User(email=email, password_hash=hash_password(password))
         db.session.add(new_user)
         db.session.commit()
         return redirect(url_for('auth.login'))
@@ -0,0 +1,287 @@
+import html
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from sqlalchemy import insert
+
+from app.extension import db
+from app.models import Comment, Ticket, User
+from app.passwords import hash_password
+
+
+BENCH_PASSWORD = 'bench-password'
+STATUSES = ['New', 'In Progress', 'Closed']
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def seed(users, hr_users, tickets, comments, chunk_size=5000, rng=random):
+    """Bulk load a benchmark dataset; returns (associate ids, an HR email, ticket id range)."""
+    password_hash = hash_password(BENCH_PASSWORD)  # hashed once, shared by every seeded account
+    db.session.execute(insert(User), [
+        {'email': f'associate{i}@bench.example.com', 'password_hash': password_hash} for i in range(users)
+    ] + [
+        {'email': f'hr{i}@bench.example.com', 'password_hash': password_hash, 'is_hr': True, 'is_approved': True}
+        for i in range(hr_users)
+    ])
+    db.session.commit()
+    associate_ids = [id for (id,) in db.session.query(User.id).filter_by(is_hr=False).order_by(User.id)]
+    hr_ids = [id for (id,) in db.session.query(User.id).filter_by(is_hr=True).order_by(User.id)]
+
+    for start in range(0, tickets, chunk_size):
+        db.session.execute(insert(Ticket), [
+            {'title': f'Benchmark ticket {n}', 'description': f'Seeded description {n} ' * 20,
+             'status': rng.choice(STATUSES), 'creator_id': rng.choice(associate_ids)}
+            for n in range(start, min(start + chunk_size, tickets))
+        ])
+        db.session.commit()
+    first_ticket, last_ticket = db.session.query(db.func.min(Ticket.id), db.func.max(Ticket.id)).one()
+
+    authors = associate_ids + hr_ids
+    for start in range(0, comments, chunk_size):
+        db.session.execute(insert(Comment), [
+            {'content': f'Seeded comment {n}', 'ticket_id': rng.randint(first_ticket, last_ticket),
+             'author_id': rng.choice(authors)}
+            for n in range(start, min(start + chunk_size, comments))
+        ])
+        db.session.commit()
+    hr_email = db.session.get(User, hr_ids[0]).email
+    return associate_ids, hr_email, (first_ticket, last_ticket)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)  # endpoint -> [(seconds, queries)]
+
+    def call(self, endpoint, method, url, expected=200, **kwargs):
+        started = time.perf_counter()
+        response = method(url, **kwargs)
+        elapsed = time.perf_counter() - started
+        if response.status_code != expected:
+            raise click.ClickException(f'{endpoint} {url} returned {response.status_code}')
+        match = SERVER_TIMING_QUERIES.search(response.headers.get('Server-Timing', ''))
+        self.samples[endpoint].append((elapsed, int(match.group(1)) if match else None))
+        return response
+
+    def report(self):
+        endpoints = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = sorted(seconds for seconds, _ in samples)
+            queries = [count for _, count in samples if count is not None]
+            total = sum(latencies)
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'mean_ms': round(total * 1000 / len(latencies), 3),
+                'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+                'throughput_rps': round(len(latencies) / total, 1) if total else None,
+                'avg_queries': round(sum(queries) / len(queries), 2) if queries else None,
+                'max_queries': max(queries) if queries else None,
+            }
+        return endpoints
+
+
+def _login_session(client, user_id):
+    # Associates cannot use the login form, so the benchmark signs them in directly.
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def run_flows(app, recorder, associate_ids, hr_email, ticket_range, iterations, rng=random):
+    # Must run outside an app context: each test client request then gets its own,
+    # exactly like a real request, instead of sharing `g` (and current_user).
+    associate = app.test_client()
+    hr = app.test_client()
+    for _ in range(iterations):
+        recorder.call('login', hr.post, '/auth/login', expected=302,
+                      data={'email': hr_email, 'password': BENCH_PASSWORD})
+        _login_session(associate, rng.choice(associate_ids))
+        recorder.call('create_ticket', associate.post, '/create_ticket', expected=302,
+                      data={'title': 'Benchmark flow ticket', 'description': 'Created by the benchmark flow'})
+        recorder.call('dashboard', associate.get, '/dashboard')
+        # HR default to their own queue, and the seeded tickets are unassigned.
+        hr_page = recorder.call('dashboard_hr', hr.get, '/dashboard?assignee=all')
+        next_page = re.search(r'href="(/dashboard\?[^"]*after=\d+)"', hr_page.get_data(as_text=True))
+        if next_page:
+            recorder.call('dashboard_hr_next', hr.get, html.unescape(next_page.group(1)))
+        ticket_id = rng.randint(*ticket_range)
+        recorder.call('view_ticket', hr.get, f'/ticket/{ticket_id}')
+        recorder.call('add_comment', hr.post, f'/ticket/{ticket_id}/comment', expected=302,
+                      data={'comment': 'Benchmark comment'})
+        recorder.call('change_status', hr.post, f'/ticket/{ticket_id}/change_status', expected=302,
+                      data={'status': rng.choice(STATUSES)})
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print per-endpoint deltas against a baseline and return the regressions."""
+    regressions = []
+    for endpoint, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if previous is None:
+            click.echo(f'{endpoint:20} new')
+            continue
+        change = (current['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] if previous['p95_ms'] else 0
+        queries_grew = (current['max_queries'] or 0) > (previous['max_queries'] or 0)
+        flag = ''
+        if change > threshold or queries_grew:
+            flag = '  REGRESSION'
+            regressions.append(endpoint)
+        click.echo(f"{endpoint:20} p95 {previous['p95_ms']:9.3f} -> {current['p95_ms']:9.3f} ms ({change:+.0%})"
+                   f"  queries {previous['max_queries']} -> {current['max_queries']}{flag}")
+    return regressions
+
+
+@click.command('bench')
+@click.option('--users', default=200, show_default=True, help='Associate accounts to seed.')
+@click.option('--hr-users', default=5, show_default=True, help='Approved HR accounts to seed.')
+@click.option('--tickets', default=10000, show_default=True, help='Tickets to seed.')
+@click.option('--comments', default=30000, show_default=True, help='Comments to seed.')
+@click.option('--iterations', default=200, show_default=True, help='Passes through the main flows.')
+@click.option('--seed', 'random_seed', default=1, show_default=True, help='Random seed, for reproducible runs.')
+@click.option('--database', default=None, help='Database URI to seed (default: a throwaway SQLite file).')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Write the results as JSON.')
+@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False),
+              help='Earlier JSON results to compare against; exits non-zero on regressions.')
+@click.option('--threshold', default=0.2, show_default=True, help='Allowed relative p95 slowdown.')
+def bench(users, hr_users, tickets, comments, iterations, random_seed, database, output, baseline_path, threshold):
+    """Seed a scratch database and time the main request flows in-process."""
+    from app import create_app
+
+    rng = random.Random(random_seed)
+    workdir = tempfile.mkdtemp(prefix='ticketing-bench-')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database or 'sqlite:///' + os.path.join(workdir, 'bench.db'),
+        'SQL_INSTRUMENTATION': True,
+        'MAIL_QUEUE_WORKER': 'external',
+        'WTF_CSRF_ENABLED': False,
+        'RATE_LIMIT_ENABLED': False,
+        'USER_CACHE_LOCAL': True,  # one process
+        'LOG_LEVEL': 'WARNING',  # the per-request app.perf lines would bury the table
+    })
+    with app.app_context():
+        started = time.perf_counter()
+        associate_ids, hr_email, ticket_range = seed(users, hr_users, tickets, comments, rng=rng)
+    click.echo(f'Seeded {users + hr_users} users, {tickets} tickets, {comments} comments '
+               f'in {time.perf_counter() - started:.1f}s', err=True)
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    run_flows(app, recorder, associate_ids, hr_email, ticket_range, iterations, rng=rng)
+    elapsed = time.perf_counter() - started
+
+    results = {
+        'revision': _git_revision(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+        'parameters': {'users': users, 'hr_users': hr_users, 'tickets': tickets, 'comments': comments,
+                       'iterations': iterations, 'seed': random_seed},
+        'total_requests': sum(len(samples) for samples in recorder.samples.values()),
+        'throughput_rps': round(sum(len(samples) for samples in recorder.samples.values()) / elapsed, 1),
+        'endpoints': recorder.report(),
+    }
+
+    click.echo(f"{'endpoint':20} {'n':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>8} {'queries':>8}")
+    for endpoint, stats in results['endpoints'].items():
+        click.echo(f"{endpoint:20} {stats['requests']:5} {stats['p50_ms']:9.3f} {stats['p95_ms']:9.3f} "
+                   f"{stats['p99_ms']:9.3f} {stats['throughput_rps']:8} {stats['max_queries']!s:>8}")
+    click.echo(f"overall: {results['total_requests']} requests, {results['throughput_rps']} req/s")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), threshold)
+        if regressions:
+            sys.exit(1)
+
+
+# Runs in a fresh interpreter per sample, the way a process manager spawns a worker.
+STARTUP_PROBE = '''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_app_ms': (created - imported) * 1000}))
+'''
+
+
+@click.command('bench-startup')
+@click.option('--runs', default=10, show_default=True, help='Fresh processes to start.')
+@click.option('--schema/--no-schema', 'auto_create', default=False, show_default=True,
+              help='Start with SCHEMA_AUTO_CREATE on (development) or off (production).')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Write the results as JSON.')
+@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False),
+              help='Earlier JSON results to compare against; exits non-zero on regressions.')
+@click.option('--threshold', default=0.2, show_default=True, help='Allowed relative slowdown of the median.')
+def bench_startup(runs, auto_create, output, baseline_path, threshold):
+    """Time `import app` and create_app() in fresh worker processes."""
+    env = dict(os.environ, SCHEMA_AUTO_CREATE=str(auto_create).lower(), MAIL_QUEUE_WORKER='external')
+    env.setdefault('DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='ticketing-bench-'), 'bench.db'))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = defaultdict(list)
+    for _ in range(runs):
+        started = time.perf_counter()
+        probe = subprocess.run([sys.executable, '-c', STARTUP_PROBE], cwd=root, env=env, capture_output=True, text=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        if probe.returncode:
+            raise click.ClickException(probe.stderr.strip().splitlines()[-1])
+        for phase, value in json.loads(probe.stdout.strip().splitlines()[-1]).items():
+            samples[phase].append(value)
+        samples['process_ms'].append(elapsed)
+
+    results = {
+        'revision': _git_revision(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'parameters': {'runs': runs, 'schema_auto_create': auto_create},
+        'phases': {phase: {'p50_ms': round(percentile(sorted(values), 0.50), 3),
+                           'p95_ms': round(percentile(sorted(values), 0.95), 3)}
+                   for phase, values in samples.items()},
+    }
+    for phase, stats in results['phases'].items():
+        click.echo(f"{phase:15} p50 {stats['p50_ms']:9.3f} ms  p95 {stats['p95_ms']:9.3f} ms")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = []
+        for phase, current in results['phases'].items():
+            previous = baseline.get('phases', {}).get(phase)
+            if previous and previous['p50_ms'] and (current['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] > threshold:
+                regressions.append(phase)
+                click.echo(f"{phase:15} p50 {previous['p50_ms']:9.3f} -> {current['p50_ms']:9.3f} ms  REGRESSION")
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,60 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import inspect
+
+from app import passwords, search
+from app.extension import db
+from app.models import User
+
+
+def create_schema():
+    """Create whatever tables are missing, the archive bind's and the search index included."""
+    db.create_all()
+    with db.engine.begin() as connection:
+        search.create_search_index(connection)
+
+
+def create_admin(email='admin@example.com', password='secure_admin_password'):
+    """Create the admin account that approves HR sign-ups; returns False if it already exists."""
+    if User.query.filter_by(email=email).first():
+        return False
+    db.session.add(User(email=email, password_hash=passwords.hash_password(password), is_admin=True))
+    db.session.commit()
+    return True
+
+
+@click.command('update-schema')
+@with_appcontext
+def update_schema_command():
+    """Bring the database schema up to date; run once per deploy when SCHEMA_AUTO_CREATE is off.
+
+    The migrations only alter tables that create_all() made, so a new database is
+    created at the latest revision and stamped; an existing one is migrated first.
+    Either way the archive tables and the search index are created if missing.
+    """
+    import flask_migrate
+
+    fresh = not inspect(db.engine).has_table(User.__tablename__)
+    if not fresh:
+        flask_migrate.upgrade()
+    create_schema()
+    if fresh:
+        flask_migrate.stamp()
+    click.echo('Schema is up to date.')
+
+
+@click.command('create-admin')
+@click.option('--email', default='admin@example.com', show_default=True)
+@click.password_option(help='Prompted for when not given.')
+@with_appcontext
+def create_admin_command(email, password):
+    """Create the admin account used to approve HR sign-ups."""
+    if create_admin(email, password):
+        click.echo(f'Admin user {email} created.')
+    else:
+        click.echo(f'User {email} already exists.')
+
+
+def init_app(app):
+    app.cli.add_command(update_schema_command)
+    app.cli.add_command(create_admin_command)
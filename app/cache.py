@@ -0,0 +1,177 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+MISSING = object()
+
+
+def _weight(value):
+    # Only string values (rendered HTML) count towards maxbytes; small dicts and
+    # counters are bounded well enough by maxsize.
+    return len(value) if isinstance(value, str) else 0
+
+
+class MemoryBackend:
+    # Process-local LRU bounded by entry count and, optionally, by the total size of
+    # its string values; entries may carry a TTL.
+
+    def __init__(self, maxsize=1024, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _pop(self, key):
+        value, _ = self._data.pop(key)
+        self._bytes -= _weight(value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is MISSING:
+                return MISSING
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._pop(key)
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires_at)
+            self._bytes += _weight(value)
+            while len(self._data) > self.maxsize or (self.maxbytes and self._bytes > self.maxbytes):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def incr(self, key):
+        with self._lock:
+            value, expires_at = self._data.get(key, (0, None))
+            self._data[key] = (value + 1, expires_at)
+            self._data.move_to_end(key)
+            return value + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    # Shared between worker processes; values are stored as JSON.
+
+    def __init__(self, url, prefix):
+        import redis  # optional dependency, only needed when CACHE_URL points at Redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix + ':'
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return MISSING if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(self.prefix + '*'))
+
+
+class Cache:
+    """A named cache with hit/miss counters.
+
+    Starts out process-local; ``init_app`` switches it to the shared backend when
+    ``CACHE_URL`` is configured so every worker sees the same entries and
+    invalidations.
+    """
+
+    registry = {}
+
+    def __init__(self, name, maxsize=1024, ttl=None, maxbytes=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.backend = MemoryBackend(maxsize, maxbytes)
+        self.hits = 0
+        self.misses = 0
+        Cache.registry[name] = self
+
+    def init_app(self, app):
+        # Optional per-cache overrides, e.g. USER_CACHE_SIZE / USER_CACHE_TTL / USER_CACHE_BYTES.
+        self.maxsize = app.config.get(f'{self.name.upper()}_CACHE_SIZE', self.maxsize)
+        self.ttl = app.config.get(f'{self.name.upper()}_CACHE_TTL', self.ttl)
+        self.maxbytes = app.config.get(f'{self.name.upper()}_CACHE_BYTES', self.maxbytes)
+        url = app.config.get('CACHE_URL')
+        if url:
+            self.backend = RedisBackend(url, prefix=f'ticketing:{self.name}')
+        else:
+            self.backend = MemoryBackend(self.maxsize, self.maxbytes)
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        value = self.backend.get(key)
+        # Counters are only ever read for reporting, so they skip the lock.
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl or self.ttl)
+
+    def get_or_set(self, key, loader, ttl=None):
+        value = self.get(key)
+        if value is MISSING:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def init_app(app):
+    for cache in Cache.registry.values():
+        cache.init_app(app)
+
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in Cache.registry.items()}
@@ -0,0 +1,24 @@
+from importlib import import_module
+
+from flask.cli import AppGroup
+
+
+class LazyAppGroup(AppGroup):
+    """app.cli, with commands whose modules are imported only when the command is
+    looked up, so a web worker never loads code that only the command line runs."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = {}  # name -> 'module:attribute'
+
+    def add_lazy_command(self, name, import_path):
+        self.lazy_commands[name] = import_path
+
+    def list_commands(self, ctx):
+        return sorted({*super().list_commands(ctx), *self.lazy_commands})
+
+    def get_command(self, ctx, name):
+        if name not in self.commands and name in self.lazy_commands:
+            module, attribute = self.lazy_commands[name].split(':')
+            self.add_command(getattr(import_module(module), attribute), name)
+        return super().get_command(ctx, name)
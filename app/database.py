@@ -0,0 +1,76 @@
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app.extension import db
+
+
+logger = logging.getLogger(__name__)
+
+
+def engine_options(config, uri=None):
+    # Builds SQLALCHEMY_ENGINE_OPTIONS from the DB_* / SQLITE_* settings, for the main
+    # database unless another bind's `uri` is given.
+    backend = make_url(uri or config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+    if backend == 'sqlite':
+        # sqlite3's own timeout is the busy handler; the pragmas are set per connection below.
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT'] / 1000}}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def _sqlite_pragmas(config):
+    return [
+        ('journal_mode', config['SQLITE_JOURNAL_MODE']),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+    ]
+
+
+def _set_sqlite_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return on_connect
+
+
+def _log_engine(bind_key, engine, pragmas):
+    # Runs on the engine's first connection, after the pragmas above are set, so a
+    # worker boots without touching the database and the line shows what is in effect.
+    def on_first_connect(dbapi_connection, connection_record):
+        logger.info('Database engine %s: %s', bind_key or 'default', describe_engine(engine, pragmas, dbapi_connection))
+    return on_first_connect
+
+
+def init_app(app):
+    pragmas = _sqlite_pragmas(app.config)
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _set_sqlite_pragmas(pragmas))
+            event.listen(engine, 'connect', _log_engine(bind_key, engine, pragmas), once=True)
+
+
+def describe_engine(engine, pragmas, dbapi_connection):
+    # Reports what is actually in effect, not just what was asked for.
+    url = engine.url.render_as_string(hide_password=True)
+    if engine.dialect.name == 'sqlite':
+        cursor = dbapi_connection.cursor()
+        effective = {}
+        for name, _ in pragmas:
+            cursor.execute(f'PRAGMA {name}')
+            effective[name] = cursor.fetchone()[0]
+        cursor.close()
+        return f'{url} ' + ' '.join(f'{name}={value}' for name, value in effective.items())
+    pool = engine.pool
+    return (f'{url} pool={type(pool).__name__} size={pool.size()} max_overflow={pool._max_overflow} '
+            f'timeout={pool.timeout()} recycle={pool._recycle} pre_ping={pool._pre_ping}')
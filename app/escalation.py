@@ -0,0 +1,110 @@
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import case, select, update
+
+from app import history
+from app.extension import db
+from app.mailqueue import enqueue_mail, notify_mail_worker
+from app.models import PRIORITIES, Ticket, User
+
+
+sla_cli = AppGroup('sla', help='SLA deadlines and escalation.')
+
+# Each escalation moves a ticket one priority up; Urgent stays Urgent.
+_NEXT_PRIORITY = case({priority: PRIORITIES[min(level + 1, len(PRIORITIES) - 1)]
+                       for level, priority in enumerate(PRIORITIES)},
+                      value=Ticket.priority, else_=Ticket.priority)
+
+
+def priority_hours():
+    return history.parse_targets(current_app.config['SLA_PRIORITY_HOURS'])
+
+
+def deadline(priority, start):
+    """When a ticket of `priority` opened at `start` breaches its SLA; None if that priority has no target."""
+    hours = priority_hours().get(priority)
+    return start + timedelta(hours=hours) if hours is not None else None
+
+
+def deadline_expression(start):
+    """deadline() as a SQL expression over each row's priority, for set-based updates."""
+    return case({priority: start + timedelta(hours=hours) for priority, hours in priority_hours().items()},
+                value=Ticket.priority, else_=None)
+
+
+def escalate_batch(now, batch_size):
+    """Escalate up to `batch_size` tickets whose deadline has passed; returns how many.
+
+    Safe with several schedulers running: the candidate SELECT skips rows another
+    node holds (FOR UPDATE SKIP LOCKED on PostgreSQL), and the UPDATE only touches
+    rows whose deadline is still set, so each breach is escalated and reported once.
+    The digests are queued in the same transaction as the escalations.
+    """
+    overdue = dict(db.session.execute(
+        select(Ticket.id, Ticket.due_at).where(Ticket.due_at <= now, Ticket.not_deleted())
+        .order_by(Ticket.due_at).limit(batch_size).with_for_update(skip_locked=True)).all())
+    if not overdue:
+        db.session.commit()
+        return 0
+    escalated = db.session.execute(
+        update(Ticket).where(Ticket.id.in_(overdue), Ticket.due_at <= now)
+        .values(priority=_NEXT_PRIORITY, due_at=None, escalated_at=now, updated_at=now)
+        .returning(Ticket.id, Ticket.title, Ticket.priority, Ticket.assignee_id),
+        execution_options={'synchronize_session': False}).all()
+    history.tickets_escalated([ticket.id for ticket in escalated], now)
+    _queue_digests(escalated, overdue)
+    db.session.commit()
+    return len(escalated)
+
+
+def _queue_digests(escalated, deadlines):
+    # One message per HR user per batch, however many of their tickets breached.
+    hr = dict(db.session.execute(
+        select(User.id, User.email).where(User.is_hr.is_(True), User.is_approved.is_(True))).all())
+    lines = {}
+    for ticket in escalated:
+        # Assignees hear about their own tickets; unassigned ones go to every HR user.
+        for user_id in [ticket.assignee_id] if ticket.assignee_id in hr else hr:
+            lines.setdefault(user_id, []).append(
+                f'#{ticket.id} {ticket.title} (due {deadlines[ticket.id]:%Y-%m-%d %H:%M} UTC, now {ticket.priority})')
+    for user_id, items in lines.items():
+        enqueue_mail(f'{len(items)} ticket(s) breached their SLA', sender=current_app.config['MAIL_DEFAULT_SENDER'],
+                     recipients=[hr[user_id]], body='Dear HR,\n\nThese tickets have passed their SLA deadline '
+                     'and have been escalated:\n\n' + '\n'.join(items) + '\n\nBest regards,\nYour Company\n')
+
+
+def run_escalation(batch_size, pause=0):
+    """Escalate every ticket past its deadline, a batch at a time; returns the total."""
+    now = datetime.utcnow()
+    total = 0
+    while True:
+        count = escalate_batch(now, batch_size)
+        total += count
+        if count < batch_size:
+            break
+        time.sleep(pause)
+    if total:
+        notify_mail_worker()
+    return total
+
+
+@sla_cli.command('escalate')
+@click.option('--batch-size', type=int, help='Tickets per batch (default SLA_ESCALATION_BATCH_SIZE).')
+@click.option('--pause', default=0.1, show_default=True, help='Seconds to wait between batches.')
+@click.option('--every', type=float, help='Keep running, starting a new pass every this many seconds.')
+def escalate_command(batch_size, pause, every):
+    """Escalate tickets that have breached their SLA and mail each HR user a digest."""
+    while True:
+        count = run_escalation(batch_size or current_app.config['SLA_ESCALATION_BATCH_SIZE'], pause)
+        click.echo(f'Escalated {count} tickets.')
+        if not every:
+            break
+        time.sleep(every)
+
+
+def init_app(app):
+    app.cli.add_command(sla_cli)
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+import click
+from flask import Blueprint, current_app, jsonify, request, session
+from flask.cli import AppGroup
+from flask_login import current_user, login_required
+from sqlalchemy import func, select
+from werkzeug.exceptions import Forbidden, HTTPException, NotFound
+
+from app.extension import db
+from app.history import status_name
+from app.models import EVENT_COMMENT, EVENT_STATUS, Comment, Ticket, TicketEvent, User
+from app.usercache import load_cached_user
+
+
+# Live updates reach the browser one of two ways. The deployed setup runs
+# `flask events serve`, which holds every EventSource connection on one asyncio loop:
+# the reverse proxy routes EVENTS_STREAM_URL (normally STREAM_PATH) to it, so it is
+# same-origin and the session cookie goes along, and EVENTS_URL (Redis) carries the
+# web workers' events over. With EVENTS_STREAM_URL unset, pages poll /events/poll
+# instead, which answers straight from the database and never holds a worker.
+
+events = Blueprint('events', __name__)
+events_cli = AppGroup('events', help='Live ticket updates.')
+
+HR_CHANNEL = 'hr'
+STREAM_PATH = '/events/stream'
+
+
+def ticket_channel(ticket_id):
+    return f'ticket:{ticket_id}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class MemoryBackend:
+    # Single process: publishing is delivery.
+
+    def __init__(self):
+        self.dispatch = lambda channel, event: None  # nobody has subscribed yet
+
+    def start(self, dispatch):
+        self.dispatch = dispatch
+
+    def publish(self, channel, event):
+        self.dispatch(channel, event)
+
+
+class RedisBackend:
+    # Carries events between processes. Each process runs one listener thread that
+    # hands incoming messages to its own local subscribers.
+
+    def __init__(self, url, prefix='ticketing:events:'):
+        import redis  # optional dependency, only needed when EVENTS_URL points at Redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def start(self, dispatch):
+        def on_message(message):
+            channel = message['channel'].decode()[len(self.prefix):]
+            dispatch(channel, json.loads(message['data']))
+
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(**{self.prefix + '*': on_message})
+        self.listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def publish(self, channel, event):
+        self.client.publish(self.prefix + channel, json.dumps(event))
+
+
+class Broker:
+    """Fans published events out to the callbacks subscribed to their channel.
+
+    Process-local until ``init_app`` finds ``EVENTS_URL``; then events go through
+    Redis so a viewer connected to one worker sees changes made on another.
+    """
+
+    def __init__(self):
+        self.backend = MemoryBackend()
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._started = False
+
+    def init_app(self, app):
+        url = app.config.get('EVENTS_URL')
+        self.backend = RedisBackend(url) if url else MemoryBackend()
+        self._started = False
+
+    def publish(self, channel, event):
+        self.backend.publish(channel, event)
+
+    def subscribe(self, channels, callback):
+        """Call `callback(event)` for every event on `channels`; returns an unsubscribe function."""
+        with self._lock:
+            if not self._started:  # publishers never need the listener
+                self.backend.start(self._dispatch)
+                self._started = True
+            for channel in channels:
+                self._subscribers[channel].add(callback)
+
+        def unsubscribe():
+            with self._lock:
+                for channel in channels:
+                    self._subscribers[channel].discard(callback)
+                    if not self._subscribers[channel]:
+                        del self._subscribers[channel]
+        return unsubscribe
+
+    def _dispatch(self, channel, event):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            callback(event)
+
+
+broker = Broker()
+
+
+def _publish(ticket_id, creator_id, event):
+    # Viewers of the ticket, its creator's dashboard and the HR dashboard.
+    for channel in (ticket_channel(ticket_id), user_channel(creator_id), HR_CHANNEL):
+        broker.publish(channel, event)
+
+
+def publish_status(ticket_id, creator_id, status):
+    _publish(ticket_id, creator_id, {'type': 'status', 'ticket_id': ticket_id, 'status': status})
+
+
+def publish_comment(ticket_id, creator_id, comment_id, author_email, content):
+    _publish(ticket_id, creator_id, {'type': 'comment', 'ticket_id': ticket_id, 'comment_id': comment_id,
+                                     'author_email': author_email, 'content': content})
+
+
+def subscription_channels(user, ticket_id=None):
+    """The channels `user` may follow: one ticket's, or their dashboard's."""
+    if ticket_id is None:
+        return [HR_CHANNEL] if user.is_hr else [user_channel(user.id)]
+    creator_id = db.session.query(Ticket.creator_id).filter(Ticket.id == ticket_id, Ticket.not_deleted()).scalar()
+    if creator_id is None:
+        raise NotFound()
+    if user.id != creator_id and not user.is_hr:  # the same rule view_ticket() applies
+        raise Forbidden()
+    return [ticket_channel(ticket_id)]
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+POLL_LIMIT = 100  # events per poll; a client further behind catches up on the next ones
+
+
+def poll_ticket(ticket_id, after):
+    """(events, cursor) for one ticket page: its current status, and comments posted after comment id `after`."""
+    status = db.session.scalar(select(Ticket.status).where(Ticket.id == ticket_id))
+    events = [{'type': 'status', 'ticket_id': ticket_id, 'status': status}]
+    if after is None:  # the first poll only fixes the starting point
+        return events, db.session.scalar(select(func.max(Comment.id)).where(Comment.ticket_id == ticket_id)) or 0
+    comments = db.session.execute(
+        select(Comment.id, User.email, Comment.content).join(User, User.id == Comment.author_id)
+        .where(Comment.ticket_id == ticket_id, Comment.id > after).order_by(Comment.id).limit(POLL_LIMIT)).all()
+    events += [{'type': 'comment', 'ticket_id': ticket_id, 'comment_id': id, 'author_email': email, 'content': content}
+               for id, email, content in comments]
+    return events, comments[-1].id if comments else after
+
+
+def poll_dashboard(user, after):
+    """(events, cursor) for a dashboard: status changes and comments logged after event id `after`."""
+    latest = db.session.scalar(select(func.max(TicketEvent.id))) or 0
+    if after is None:
+        return [], latest
+    query = (select(TicketEvent.id, TicketEvent.ticket_id, TicketEvent.kind, TicketEvent.status)
+             .where(TicketEvent.id > after, TicketEvent.id <= latest,
+                    TicketEvent.kind.in_((EVENT_STATUS, EVENT_COMMENT)))
+             .order_by(TicketEvent.id).limit(POLL_LIMIT))
+    if not user.is_hr:  # the same rule as their dashboard
+        query = query.join(Ticket, Ticket.id == TicketEvent.ticket_id).where(Ticket.creator_id == user.id)
+    rows = db.session.execute(query).all()
+    events = [{'type': 'status', 'ticket_id': ticket_id, 'status': status_name(status)} if kind == EVENT_STATUS
+              else {'type': 'comment', 'ticket_id': ticket_id} for _, ticket_id, kind, status in rows]
+    return events, rows[-1].id if len(rows) == POLL_LIMIT else latest
+
+
+@events.route('/poll')
+@login_required
+def poll():
+    # Answers at once from the database, so no worker waits on an idle client and
+    # every process sees every change, with or without EVENTS_URL.
+    ticket_id, after = request.args.get('ticket', type=int), request.args.get('after', type=int)
+    if ticket_id is None:
+        events, cursor = poll_dashboard(current_user, after)
+    else:
+        subscription_channels(current_user, ticket_id)  # 404 / 403, as the stream server answers
+        events, cursor = poll_ticket(ticket_id, after)
+    response = jsonify({'cursor': cursor, 'events': events})
+    response.cache_control.no_store = True
+    return response
+
+
+def events_stream_url(**params):
+    # Where browsers open their EventSource, or None to poll instead.
+    base = current_app.config.get('EVENTS_STREAM_URL')
+    if not base:
+        return None
+    query = '&'.join(f'{key}={value}' for key, value in params.items() if value is not None)
+    return f'{base}?{query}' if query else base
+
+
+def init_app(app):
+    stream_url = app.config.get('EVENTS_STREAM_URL')
+    if stream_url and urlsplit(stream_url).netloc:
+        # A cross-origin EventSource would not carry the session cookie.
+        raise RuntimeError(f'EVENTS_STREAM_URL must be a path on this site, such as {STREAM_PATH}')
+    if stream_url and not app.config.get('EVENTS_URL'):
+        raise RuntimeError('EVENTS_STREAM_URL needs EVENTS_URL, or the stream server never hears of a change')
+    broker.init_app(app)
+    app.register_blueprint(events, url_prefix='/events')
+    app.add_template_global(events_stream_url)
+    app.cli.add_command(events_cli)
+
+
+# The stream server: one asyncio loop holds every idle connection, so none of them
+# ties up a WSGI thread. Run it behind the same proxy as the app, for example with
+# nginx `location /events/stream { proxy_pass http://127.0.0.1:5001; proxy_buffering off; }`.
+
+def _authorize(app, path, cookie):
+    with app.test_request_context(path, headers={'Cookie': cookie} if cookie else {}):
+        try:
+            user_id = session.get('_user_id')  # Flask-Login's session key
+            user = load_cached_user(int(user_id)) if user_id else None
+            if user is None:
+                return 401, None
+            return 200, subscription_channels(user, request.args.get('ticket', type=int))
+        except HTTPException as error:
+            return error.code, None
+
+
+async def _serve_client(app, reader, writer, path, heartbeat):
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while (line := (await reader.readline()).decode('latin-1').strip()):
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if len(request_line) < 2 or request_line[0] != 'GET' or urlsplit(request_line[1]).path != path:
+            writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            return
+        code, channels = await asyncio.to_thread(_authorize, app, request_line[1], headers.get('cookie'))
+        if channels is None:
+            writer.write(f'HTTP/1.1 {code} {HTTPStatus(code).phrase}\r\n'
+                         'Content-Length: 0\r\nConnection: close\r\n\r\n'.encode())
+            return
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+                     + ''.join(f'{name}: {value}\r\n' for name, value in SSE_HEADERS.items()).encode()
+                     + b'Connection: keep-alive\r\n\r\nretry: 3000\n\n')
+
+        loop = asyncio.get_running_loop()
+        inbox = asyncio.Queue(maxsize=100)
+
+        def enqueue(event):
+            if not inbox.full():  # a stalled client; it resyncs by reloading
+                inbox.put_nowait(event)
+
+        unsubscribe = broker.subscribe(channels, lambda event: loop.call_soon_threadsafe(enqueue, event))
+        try:
+            while True:
+                try:
+                    writer.write(format_event(await asyncio.wait_for(inbox.get(), heartbeat)).encode())
+                except asyncio.TimeoutError:
+                    writer.write(b': keepalive\n\n')
+                await writer.drain()
+        finally:
+            unsubscribe()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+@events_cli.command('serve')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=5001, show_default=True)
+def serve(host, port):
+    """Serve EVENTS_STREAM_URL from a single asyncio loop, behind the app's reverse proxy."""
+    app = current_app._get_current_object()
+    if not app.config.get('EVENTS_URL'):
+        raise click.UsageError('Set EVENTS_URL so the stream server receives events from the web workers.')
+    path = urlsplit(app.config.get('EVENTS_STREAM_URL') or STREAM_PATH).path
+    heartbeat = app.config['EVENTS_HEARTBEAT']
+
+    async def main():
+        server = await asyncio.start_server(
+            lambda reader, writer: _serve_client(app, reader, writer, path, heartbeat), host, port)
+        click.echo(f'Event stream server listening on {host}:{port}, serving {path}')
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
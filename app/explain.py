@@ -0,0 +1,90 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, text
+
+from app.extension import db
+from app.models import (Comment, EVENT_COMMENT, OPEN_STATUSES, OutboundEmail, Ticket, TicketEvent, TicketSignatureBand,
+                        User)
+from app.queries import ticket_list_query
+
+
+def hot_queries():
+    # The statements behind the busiest views, with representative parameters.
+    # List queries carry a keyset cursor, as every page after the first does.
+    def dashboard(**filters):
+        return ticket_list_query(**filters).filter(Ticket.id < 1000).order_by(Ticket.id.desc()).limit(51).statement
+
+    return [
+        ('dashboard (all tickets)', dashboard()),
+        ('dashboard (by creator)', dashboard(creator_id=1)),
+        ('dashboard (by status)', dashboard(status='New')),
+        ('dashboard (my queue)', dashboard(assignee=1)),
+        ('dashboard (by creator and status)', dashboard(creator_id=1, status='New')),
+        ('claim next ticket', select(Ticket.id).where(Ticket.not_deleted(), Ticket.status.in_(OPEN_STATUSES),
+                                                      Ticket.assignee_id.is_(None)).order_by(Ticket.id).limit(1)),
+        ('duplicate candidates', select(TicketSignatureBand.ticket_id).where(TicketSignatureBand.band_key.in_([1, 2, 3]))),
+        ('ticket detail', select(Ticket).where(Ticket.id == 1, Ticket.not_deleted())),
+        ('comment listing', select(Comment).where(Comment.ticket_id == 1).order_by(Comment.id)),
+        ('comments by author', select(Comment.id).where(Comment.author_id == 1)),
+        ('login / creator lookup', select(User).where(User.email == 'someone@example.com')),
+        ('pending HR approvals', select(User).where(User.is_hr.is_(True), User.is_approved.is_(False))),
+        ('HR recipients', select(User.email).where(User.is_hr.is_(True), User.is_approved.is_(True))),
+        ('mail outbox', select(OutboundEmail.id).where(OutboundEmail.status == 'pending',
+                                                       OutboundEmail.next_attempt_at <= '2030-01-01')
+         .order_by(OutboundEmail.next_attempt_at).limit(20)),
+        ('SLA breaches', select(Ticket.id, Ticket.due_at).where(Ticket.due_at <= '2030-01-01', Ticket.not_deleted())
+         .order_by(Ticket.due_at).limit(500)),
+        ('ticket history report', select(TicketEvent.ticket_id, TicketEvent.kind, TicketEvent.status,
+                                         TicketEvent.created_at)
+         .where(TicketEvent.kind != EVENT_COMMENT).order_by(TicketEvent.ticket_id, TicketEvent.id)),
+    ]
+
+
+def _sqlite_plan(connection, sql):
+    rows = connection.execute(text('EXPLAIN QUERY PLAN ' + sql)).all()
+    plan = [row[-1] for row in rows]
+    # "SCAN <table>" without an index is a full table scan; a temp b-tree means
+    # the whole match set is sorted before LIMIT applies.
+    problems = [line for line in plan
+                if (line.startswith('SCAN ') and ' USING ' not in line) or 'TEMP B-TREE' in line]
+    return plan, problems
+
+
+def _postgresql_plan(connection, sql):
+    # With sequential scans disabled the planner only falls back to one when no
+    # usable index exists, so small development tables still give a useful answer.
+    connection.execute(text('SET LOCAL enable_seqscan = off'))
+    plan = [row[0] for row in connection.execute(text('EXPLAIN ' + sql)).all()]
+    problems = [line.strip() for line in plan if 'Seq Scan' in line]
+    return plan, problems
+
+
+def explain_hot_queries():
+    """Return (name, plan lines, problem lines) for every hot query."""
+    engine = db.engine
+    explain = {'sqlite': _sqlite_plan, 'postgresql': _postgresql_plan}.get(engine.dialect.name)
+    if explain is None:
+        raise click.ClickException(f'EXPLAIN check is not implemented for {engine.dialect.name}')
+    results = []
+    with engine.connect() as connection:
+        for name, statement in hot_queries():
+            sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+            with connection.begin():
+                plan, problems = explain(connection, sql)
+            results.append((name, plan, problems))
+    return results
+
+
+@click.command('check-indexes')
+@click.option('--verbose', '-v', is_flag=True, help='Print the full plan of every query.')
+@with_appcontext
+def check_indexes(verbose):
+    """EXPLAIN every hot query and fail if one needs a full table scan."""
+    failures = 0
+    for name, plan, problems in explain_hot_queries():
+        click.echo(f"{'FAIL' if problems else 'ok  '} {name}")
+        for line in (plan if verbose else problems):
+            click.echo(f'       {line}')
+        failures += bool(problems)
+    if failures:
+        raise click.ClickException(f'{failures} hot queries are not served by an index')
@@ -1,7 +1,10 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import MultipleFileField
 from wtforms import StringField, TextAreaField, SubmitField, PasswordField, SelectField
 from wtforms.validators import DataRequired, Email, EqualTo
 
+from app.models import PRIORITIES, TICKET_CATEGORIES, TICKET_STATUSES
+
 
 class LoginForm(FlaskForm):
     email = StringField('Email', validators=[DataRequired(), Email()])
@@ -20,6 +23,7 @@ class RegistrationForm(FlaskForm):
 class CommentForm(FlaskForm):
     comment = StringField('Add your comments/query here', validators=[DataRequired(
         message="Please enter a comment before submitting.")])
+    attachments = MultipleFileField('Attachments')
     submit = SubmitField('Submit Comment')
 
 
@@ -34,9 +38,18 @@ class HRRegistrationForm(FlaskForm):
 class TicketForm(FlaskForm):
     title = StringField('Title', validators=[DataRequired()])
     description = TextAreaField('Description', validators=[DataRequired()])
+    # SelectField rejects anything outside its choices, so only known values reach the database.
+    priority = SelectField('Priority', choices=[(value, value) for value in PRIORITIES], default='Normal')
+    category = SelectField('Category', choices=[(value, value) for value in TICKET_CATEGORIES], default='Other')
+    attachments = MultipleFileField('Attachments (logs, screenshots)')
     submit = SubmitField('Submit')
 
 class StatusForm(FlaskForm):
-    status_choices = [('New', 'New'), ('In Progress', 'In Progress'), ('Closed', 'Closed')]  # Define status choices
+    status_choices = [(value, value) for value in TICKET_STATUSES]
     status = SelectField('Status', choices=status_choices, validators=[DataRequired()])
     submit = SubmitField('Update Status')
+
+
+class PriorityForm(FlaskForm):
+    priority = SelectField('Priority', choices=[(value, value) for value in PRIORITIES], validators=[DataRequired()])
+    submit = SubmitField('Update Priority')
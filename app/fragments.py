@@ -0,0 +1,59 @@
+from flask import render_template
+from flask_login import current_user
+from markupsafe import Markup
+
+from app.attachments import comment_attachments
+from app.cache import MISSING, Cache
+from app.queries import archived_comment_page, comment_page
+
+
+# Rendered HTML for the parts of the dashboard and ticket pages that are the same
+# for every viewer of a given role: one table row per ticket and a ticket's comment
+# thread. Keys carry the ticket's updated_at, which change_status, add_comment,
+# delete_ticket and the bulk updates all write in the same commit as the change, so
+# a write makes the old entries unreachable and the LRU ages them out.
+fragment_cache = Cache('fragment', maxsize=5000, ttl=3600, maxbytes=32 * 1024 * 1024)
+
+
+def viewer_role(user):
+    return 'hr' if user.is_hr else 'associate'
+
+
+def _version(ticket):
+    return ticket.updated_at.isoformat()
+
+
+def cached_fragment(key, render):
+    html = fragment_cache.get(key)
+    if html is MISSING:
+        html = str(render())
+        fragment_cache.set(key, html)
+    return Markup(html)
+
+
+def ticket_row(ticket):
+    """The dashboard table row for one ticket (a ticket_list_query row)."""
+    key = f'row:{ticket.id}:{_version(ticket)}:{viewer_role(current_user)}'
+    return cached_fragment(key, lambda: render_template('fragments/ticket_row.html', ticket=ticket))
+
+
+def comment_thread(ticket, args, per_page, archived=False):
+    """One page of a ticket's comments with its pagination links.
+
+    A hit skips the comment query as well as the rendering.
+    """
+    after, before = args.get('after', type=int), args.get('before', type=int)
+    key = (f"thread:{'archived' if archived else 'live'}:{ticket.id}:{_version(ticket)}:"
+           f'{viewer_role(current_user)}:{after}:{before}:{per_page}')
+
+    def render():
+        page = (archived_comment_page if archived else comment_page)(ticket.id, args, per_page)
+        # Archived comments keep their original id in comment_id, which is what attachments refer to.
+        files = comment_attachments([comment.comment_id if archived else comment.id for comment in page.items])
+        return render_template('fragments/comment_thread.html', ticket=ticket, comments=page.items,
+                               comment_page=page, archived=archived, attachments=files)
+    return cached_fragment(key, render)
+
+
+def init_app(app):
+    app.add_template_global(ticket_row)
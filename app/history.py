@@ -0,0 +1,179 @@
+import json
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import insert, literal, select
+
+from app.extension import db
+from app.models import (EVENT_BASELINE, EVENT_COMMENT, EVENT_CREATED, EVENT_DELETED, EVENT_ESCALATED, EVENT_STATUS,
+                        Ticket, TICKET_STATUSES, TicketEvent)
+
+
+history_cli = AppGroup('history', help='Ticket history and time-in-status reports.')
+
+STATUS_CODES = {status: code for code, status in enumerate(TICKET_STATUSES, 1)}
+RESOLVED_STATUSES = ('Resolved', 'Closed')
+ENTERS_STATUS = (EVENT_CREATED, EVENT_STATUS, EVENT_BASELINE)
+
+
+def status_code(status):
+    return STATUS_CODES.get(status, 0)  # 0: a status outside TICKET_STATUSES
+
+
+def status_name(code):
+    return TICKET_STATUSES[code - 1] if 0 < code <= len(TICKET_STATUSES) else 'unknown'
+
+
+def _row(ticket_id, kind, status=None, actor=None, at=None):
+    return {'ticket_id': ticket_id, 'kind': kind, 'status': None if status is None else status_code(status),
+            'actor_id': actor.id if actor is not None else None, 'created_at': at or datetime.utcnow()}
+
+
+# Each of these only adds to the session; the event commits with the change it describes.
+
+def ticket_created(ticket, actor):
+    db.session.add(TicketEvent(**_row(ticket.id, EVENT_CREATED, ticket.status, actor, ticket.created_at)))
+
+
+def status_changed(ticket, status, actor):
+    db.session.add(TicketEvent(**_row(ticket.id, EVENT_STATUS, status, actor)))
+
+
+def comment_added(ticket, actor):
+    db.session.add(TicketEvent(**_row(ticket.id, EVENT_COMMENT, actor=actor)))
+
+
+def ticket_deleted(ticket, actor):
+    db.session.add(TicketEvent(**_row(ticket.id, EVENT_DELETED, actor=actor)))
+
+
+def tickets_imported(rows):
+    """Created events for bulk-inserted tickets, as (ticket_id, status, created_at) tuples."""
+    if rows:
+        db.session.execute(insert(TicketEvent), [_row(ticket_id, EVENT_CREATED, status, at=created_at)
+                                                 for ticket_id, status, created_at in rows])
+
+
+def tickets_escalated(ticket_ids, at):
+    if ticket_ids:
+        db.session.execute(insert(TicketEvent), [_row(ticket_id, EVENT_ESCALATED, at=at) for ticket_id in ticket_ids])
+
+
+def statuses_changed(status, actor, criteria):
+    # INSERT ... SELECT over the rows the accompanying bulk UPDATE is about to move.
+    columns = select(Ticket.id, literal(EVENT_STATUS), literal(status_code(status)),
+                     literal(actor.id if actor is not None else None), literal(datetime.utcnow()))
+    db.session.execute(insert(TicketEvent).from_select(
+        ['ticket_id', 'kind', 'status', 'actor_id', 'created_at'], columns.where(*criteria)))
+
+
+class Durations:
+    """Count, total and maximum of a set of intervals, plus how many ran over `target` seconds."""
+
+    def __init__(self, target=None):
+        self.target = target
+        self.count = self.running = self.breaches = 0
+        self.total = self.longest = 0.0
+
+    def add(self, seconds, running=False):
+        self.count += 1
+        self.running += running
+        self.total += seconds
+        self.longest = max(self.longest, seconds)
+        if self.target is not None and seconds > self.target:
+            self.breaches += 1
+
+    def report(self):
+        return {'count': self.count, 'still_running': self.running,
+                'mean_hours': round(self.total / self.count / 3600, 2) if self.count else None,
+                'max_hours': round(self.longest / 3600, 2),
+                'target_hours': None if self.target is None else round(self.target / 3600, 2),
+                'breaches': self.breaches if self.target is not None else None}
+
+
+def time_in_status(status_targets=None, resolution_target=None, until=None, batch_size=5000):
+    """Time spent in each status, and from creation to resolution, over the whole log.
+
+    One pass over the events in (ticket, id) order: only the ticket being read is
+    held in memory, so the cost grows linearly with the log. Targets are in hours;
+    an interval still open at `until` (default now) counts up to then.
+    """
+    until = until or datetime.utcnow()
+    targets = {status: hours * 3600 for status, hours in (status_targets or {}).items()}
+    by_status = {}
+    resolution = Durations(None if resolution_target is None else resolution_target * 3600)
+
+    def spent(code, seconds, running=False):
+        name = status_name(code)
+        if name not in by_status:
+            by_status[name] = Durations(targets.get(name))
+        by_status[name].add(seconds, running)
+
+    def finish(status, entered, created, resolved):
+        if status is not None:
+            spent(status, (until - entered).total_seconds(), running=True)
+            if created is not None and not resolved:
+                resolution.add((until - created).total_seconds(), running=True)
+
+    resolved_codes = {status_code(status) for status in RESOLVED_STATUSES}
+    events = db.session.execute(
+        select(TicketEvent.ticket_id, TicketEvent.kind, TicketEvent.status, TicketEvent.created_at)
+        .where(TicketEvent.kind != EVENT_COMMENT).order_by(TicketEvent.ticket_id, TicketEvent.id),
+        execution_options={'yield_per': batch_size})
+    current = status = entered = created = None
+    resolved = False
+    for ticket_id, kind, code, at in events:
+        if ticket_id != current:
+            finish(status, entered, created, resolved)
+            current, status, entered, created, resolved = ticket_id, None, None, None, False
+        if kind == EVENT_ESCALATED:  # a marker; the status clock runs on
+            continue
+        if status is not None:
+            spent(status, (at - entered).total_seconds())
+        if kind in ENTERS_STATUS:
+            status, entered = code, at
+            if kind == EVENT_CREATED:
+                created = at
+            if code in resolved_codes and created is not None and not resolved:
+                resolution.add((at - created).total_seconds())
+                resolved = True
+        elif kind == EVENT_DELETED:  # the clock stops
+            status = None
+    finish(status, entered, created, resolved)
+    db.session.rollback()  # ends the read transaction and releases the cursor
+
+    return {'until': until.isoformat(timespec='seconds') + 'Z',
+            'statuses': {name: durations.report() for name, durations in by_status.items()},
+            'resolution': resolution.report()}
+
+
+def parse_targets(value):
+    """'New=24,In Progress=72' -> {'New': 24.0, 'In Progress': 72.0}"""
+    targets = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        status, _, hours = item.partition('=')
+        targets[status.strip()] = float(hours)
+    return targets
+
+
+@history_cli.command('report')
+@click.option('--json', 'as_json', is_flag=True, help='Print the report as JSON.')
+def report_command(as_json):
+    """Time in each status and time to resolution, against the SLA targets."""
+    config = current_app.config
+    report = time_in_status(parse_targets(config['SLA_STATUS_HOURS']), config['SLA_RESOLUTION_HOURS'])
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+    click.echo(f"{'':15} {'count':>7} {'running':>7} {'mean h':>9} {'max h':>9} {'target h':>9} {'breaches':>8}")
+    rows = [(status, report['statuses'][status]) for status in (*TICKET_STATUSES, 'unknown')
+            if status in report['statuses']]
+    for name, stats in rows + [('to resolution', report['resolution'])]:
+        click.echo(f"{name:15} {stats['count']:7} {stats['still_running']:7} {stats['mean_hours']!s:>9} "
+                   f"{stats['max_hours']:9} {stats['target_hours']!s:>9} {stats['breaches']!s:>8}")
+
+
+def init_app(app):
+    app.cli.add_command(history_cli)
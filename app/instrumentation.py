@@ -0,0 +1,186 @@
+import json
+import logging
+import threading
+import time
+
+from flask import Blueprint, current_app, g, has_request_context, redirect, render_template, request, url_for
+from flask import before_render_template, template_rendered
+from flask_login import current_user, login_required
+from sqlalchemy import event
+
+from app.cache import cache_stats
+from app.extension import db
+
+
+logger = logging.getLogger('app.perf')
+
+instrumentation = Blueprint('instrumentation', __name__)
+
+
+class RequestStats:
+    __slots__ = ('started', 'query_count', 'sql_time', 'slowest_time', 'slowest_statement',
+                 'render_time', 'render_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.render_time = 0.0
+        self.render_started = []  # a stack: templates render others, e.g. cached dashboard rows
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.total_time = 0.0
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.max_queries = 0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+
+    def add(self, stats, elapsed):
+        self.requests += 1
+        self.total_time += elapsed
+        self.query_count += stats.query_count
+        self.sql_time += stats.sql_time
+        self.render_time += stats.render_time
+        self.max_queries = max(self.max_queries, stats.query_count)
+        if stats.slowest_time > self.slowest_time:
+            self.slowest_time = stats.slowest_time
+            self.slowest_statement = stats.slowest_statement
+
+    def as_dict(self):
+        n = self.requests or 1
+        return {
+            'requests': self.requests,
+            'avg_ms': round(self.total_time * 1000 / n, 2),
+            'avg_queries': round(self.query_count / n, 2),
+            'max_queries': self.max_queries,
+            'avg_sql_ms': round(self.sql_time * 1000 / n, 2),
+            'avg_render_ms': round(self.render_time * 1000 / n, 2),
+            'slowest_sql_ms': round(self.slowest_time * 1000, 2),
+            'slowest_statement': self.slowest_statement,
+        }
+
+
+class PerfRegistry:
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, stats, elapsed):
+        with self._lock:
+            self.endpoints.setdefault(endpoint, EndpointStats()).add(stats, elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in sorted(self.endpoints.items())}
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+
+
+def _current_stats():
+    return g.get('perf') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault('perf_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    if stats is None or not conn.info.get('perf_started'):
+        return
+    elapsed = time.perf_counter() - conn.info['perf_started'].pop()
+    stats.query_count += 1
+    stats.sql_time += elapsed
+    if elapsed > stats.slowest_time:
+        stats.slowest_time = elapsed
+        stats.slowest_statement = statement
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _current_stats()
+    if stats is not None:
+        stats.render_started.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    # Only the outermost render counts; the nested ones are already inside its time.
+    stats = _current_stats()
+    if stats is not None and stats.render_started:
+        started = stats.render_started.pop()
+        if not stats.render_started:
+            stats.render_time += time.perf_counter() - started
+
+
+def _start_request():
+    g.perf = RequestStats()
+
+
+def _finish_request(response):
+    stats = g.pop('perf', None)
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - stats.started
+    endpoint = request.endpoint or 'unmatched'
+    response.headers['Server-Timing'] = ', '.join([
+        f'db;dur={stats.sql_time * 1000:.2f};desc="{stats.query_count} queries"',
+        f'render;dur={stats.render_time * 1000:.2f}',
+        f'total;dur={elapsed * 1000:.2f}',
+    ])
+    current_app.extensions['perf_stats'].record(endpoint, stats, elapsed)
+    logger.info(json.dumps({
+        'endpoint': endpoint,
+        'method': request.method,
+        'status': response.status_code,
+        'duration_ms': round(elapsed * 1000, 2),
+        'queries': stats.query_count,
+        'sql_ms': round(stats.sql_time * 1000, 2),
+        'render_ms': round(stats.render_time * 1000, 2),
+        'slowest_sql_ms': round(stats.slowest_time * 1000, 2),
+        'slowest_statement': stats.slowest_statement,
+    }))
+    return response
+
+
+def init_app(app):
+    # Nothing is hooked up unless SQL_INSTRUMENTATION is on, so a disabled
+    # instrumentation layer costs nothing per request or per query.
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+    app.extensions['perf_stats'] = PerfRegistry()
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.register_blueprint(instrumentation)
+
+
+@instrumentation.route('/admin/perf')
+@login_required
+def perf_stats():
+    if not current_user.is_admin:
+        return redirect(url_for('index'))
+    return render_template('admin/perf_stats.html', endpoints=current_app.extensions['perf_stats'].snapshot(),
+                           caches=cache_stats())
+
+
+@instrumentation.route('/admin/perf/reset', methods=['POST'])
+@login_required
+def reset_perf_stats():
+    if not current_user.is_admin:
+        return redirect(url_for('index'))
+    current_app.extensions['perf_stats'].reset()
+    return redirect(url_for('instrumentation.perf_stats'))
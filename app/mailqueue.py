@@ -0,0 +1,198 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from smtplib import SMTPException, SMTPRecipientsRefused
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.extension import db
+from app.models import OutboundEmail
+
+
+logger = logging.getLogger(__name__)
+
+mail_cli = AppGroup('mail', help='Outbound mail queue.')
+
+
+def enqueue_mail(subject, sender, recipients, body):
+    # Only adds the row to the session; it is committed together with the caller's
+    # own changes, so a rolled back ticket never produces a notification.
+    email = OutboundEmail(subject=subject, sender=sender, recipients='\n'.join(recipients), body=body)
+    db.session.add(email)
+    return email
+
+
+def notify_mail_worker():
+    worker = current_app.extensions.get('mail_worker')
+    if worker is not None:
+        worker.wake()
+
+
+def _mail():
+    # Flask-Mail is imported by whatever sends (the worker thread, `flask mail worker`),
+    # not by create_app; its settings are read from the app config on first use.
+    from flask_mail import Mail
+
+    app = current_app._get_current_object()
+    return app.extensions.get('mail') or Mail().init_app(app)
+
+
+def _claim_batch(batch_size, lease):
+    now = datetime.utcnow()
+    candidates = db.session.query(OutboundEmail.id).filter(
+        OutboundEmail.status == 'pending', OutboundEmail.next_attempt_at <= now
+    ).order_by(OutboundEmail.next_attempt_at).limit(batch_size).all()
+    claimed = []
+    for (email_id,) in candidates:
+        # Pushing next_attempt_at forward acts as a lease: another worker skips the
+        # row, and if this one dies the row simply becomes due again.
+        result = db.session.execute(
+            db.update(OutboundEmail)
+            .where(OutboundEmail.id == email_id, OutboundEmail.status == 'pending',
+                   OutboundEmail.next_attempt_at <= now)
+            .values(next_attempt_at=now + lease, attempts=OutboundEmail.attempts + 1)
+        )
+        if result.rowcount == 1:
+            claimed.append(email_id)
+    db.session.commit()
+    if not claimed:
+        return []
+    return OutboundEmail.query.filter(OutboundEmail.id.in_(claimed)).order_by(OutboundEmail.id).all()
+
+
+def _mark_failed(email, error, max_attempts, backoff):
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = 'failed'
+        logger.error('Giving up on email %s after %s attempts: %s', email.id, email.attempts, error)
+    else:
+        email.next_attempt_at = datetime.utcnow() + backoff * (2 ** (email.attempts - 1))
+        logger.warning('Email %s failed (attempt %s), retrying: %s', email.id, email.attempts, error)
+
+
+def deliver_pending(batch_size=20, max_attempts=5, backoff=timedelta(seconds=30), lease=timedelta(minutes=5)):
+    """Send one batch of due emails over a single SMTP connection.
+
+    Returns the number of emails claimed, so callers can keep going until the
+    queue is drained.
+    """
+    batch = _claim_batch(batch_size, lease)
+    if not batch:
+        return 0
+    from flask_mail import Message
+
+    handled = set()
+    try:
+        with _mail().connect() as connection:
+            for email in batch:
+                message = Message(email.subject, sender=email.sender,
+                                  recipients=email.recipients.split('\n'), body=email.body)
+                try:
+                    connection.send(message)
+                except SMTPRecipientsRefused as e:
+                    _mark_failed(email, e, max_attempts, backoff)
+                else:
+                    email.status = 'sent'
+                    email.sent_at = datetime.utcnow()
+                    email.last_error = None
+                handled.add(email.id)
+    except (SMTPException, OSError) as e:
+        # Connection level failure (DNS, refused, TLS, auth): everything not yet
+        # sent in this batch is retried later.
+        for email in batch:
+            if email.id not in handled:
+                _mark_failed(email, e, max_attempts, backoff)
+    db.session.commit()
+    return len(batch)
+
+
+class MailWorker:
+    """Background thread draining the outbox.
+
+    The worker sleeps until it is woken by a new enqueue or the poll interval
+    passes, then sends batches until nothing is due.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.poll_interval = app.config['MAIL_QUEUE_POLL_INTERVAL']
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='mail-worker', daemon=True)
+                self._thread.start()
+
+    def start_with_first_request(self):
+        # Command line runs (`flask db upgrade`, `flask sla escalate`) build the app too,
+        # but only a process that serves requests needs the thread.
+        if self._thread is None:
+            self.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.drain()
+                except Exception:
+                    logger.exception('Mail worker iteration failed')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def drain(self):
+        config = self.app.config
+        while deliver_pending(batch_size=config['MAIL_QUEUE_BATCH_SIZE'],
+                              max_attempts=config['MAIL_QUEUE_MAX_ATTEMPTS'],
+                              backoff=timedelta(seconds=config['MAIL_QUEUE_BACKOFF'])):
+            if self._stopped.is_set():
+                break
+
+
+def init_app(app):
+    app.cli.add_command(mail_cli)
+    if app.config['MAIL_QUEUE_WORKER'] == 'thread':
+        worker = MailWorker(app)
+        app.extensions['mail_worker'] = worker
+        app.before_request(worker.start_with_first_request)
+
+
+@mail_cli.command('worker')
+def run_worker():
+    """Run the outbox delivery loop in this process."""
+    worker = MailWorker(current_app._get_current_object())
+    click.echo('Delivering queued mail, press Ctrl+C to stop.')
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+@mail_cli.command('sink')
+@click.option('--host', default='127.0.0.1')
+@click.option('--port', default=1025, type=int)
+def run_sink(host, port):
+    """Run a local SMTP server that accepts and prints every message."""
+    from app.mailsink import SMTPSink
+
+    sink = SMTPSink(host, port, echo=True)
+    click.echo(f'SMTP sink listening on {host}:{port}')
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        sink.shutdown()
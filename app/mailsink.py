@@ -0,0 +1,90 @@
+import socketserver
+import threading
+from email import message_from_bytes
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    # Just enough of RFC 5321 for smtplib: no auth, no STARTTLS, no pipelining.
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 ticketing-system smtp sink')
+        envelope_from, envelope_to = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode(errors='replace').strip().partition(' ')
+            command = command.upper()
+            if command in ('HELO', 'EHLO'):
+                self.reply('250 sink')
+            elif command == 'MAIL':
+                envelope_from, envelope_to = argument.partition(':')[2].strip('<> '), []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                envelope_to.append(argument.partition(':')[2].strip('<> '))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                self.server.deliver(envelope_from, envelope_to, b''.join(data))
+                self.reply('250 OK')
+            elif command in ('RSET', 'NOOP'):
+                envelope_from, envelope_to = None, []
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Local stand-in for MAIL_SERVER that keeps every message it receives.
+
+    Usable from the ``flask mail sink`` command or directly in tests::
+
+        with SMTPSink('127.0.0.1', 0) as sink:
+            sink.start()
+            app.config['MAIL_PORT'] = sink.port
+            ...
+            assert sink.messages
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=1025, echo=False):
+        super().__init__((host, port), _SMTPHandler)
+        self.echo = echo
+        self.messages = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def deliver(self, envelope_from, envelope_to, data):
+        message = message_from_bytes(data)
+        with self._lock:
+            self.messages.append((envelope_from, list(envelope_to), message))
+        if self.echo:
+            print(f'--- {envelope_from} -> {", ".join(envelope_to)}')
+            print(data.decode(errors='replace'))
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='smtp-sink', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def __exit__(self, *args):
+        if self._thread is not None:
+            self.shutdown()
+        super().__exit__(*args)
@@ -1,25 +1,37 @@
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 
 
 from app.extension import db
+from app.passwords import hash_password, verify_password
 
 
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(100), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))  # scrypt hashes are 162 characters
     is_hr = db.Column(db.Boolean, default=False)
     is_admin = db.Column(db.Boolean, default=False)
     is_approved = db.Column(db.Boolean, default=False)
 
+    __table_args__ = (
+        db.Index('ix_user_is_hr_is_approved', 'is_hr', 'is_approved'),  # HR approvals and recipient lookups
+    )
+
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+TICKET_STATUSES = ('New', 'In Progress', 'Resolved', 'Closed')
+OPEN_STATUSES = ('New', 'In Progress')
+PRIORITIES = ('Low', 'Normal', 'High', 'Urgent')  # ascending; escalation moves a ticket one step up
+TICKET_CATEGORIES = ('Hardware', 'Software', 'Access', 'Network', 'Payroll', 'Other')
+
 
 class Ticket(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -27,13 +39,168 @@ class Ticket(db.Model):
     description = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(20), default='New')  # Consider using an enum
     creator_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    creator = db.relationship('User', backref='tickets')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Bumped by status changes and new comments; drives API ETags / Last-Modified.
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    deleted_at = db.Column(db.DateTime)  # soft delete; app/archive.py moves the row out later
+    assignee_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # the HR user working it; see app/assignment.py
+    priority = db.Column(db.String(10), nullable=False, default='Normal')
+    category = db.Column(db.String(20), nullable=False, default='Other')
+    # SLA deadline while the ticket is open and not yet escalated, NULL otherwise, so the
+    # index on it holds only the tickets the escalation scheduler still has to watch.
+    due_at = db.Column(db.DateTime)
+    sla_started_at = db.Column(db.DateTime)  # when the clock behind due_at started: creation, or the last reopen
+    escalated_at = db.Column(db.DateTime)
+    creator = db.relationship('User', backref='tickets', foreign_keys=[creator_id])
+    assignee = db.relationship('User', foreign_keys=[assignee_id])
+
+    __table_args__ = (
+        # Dashboard filters, each followed by id for the keyset ORDER BY.
+        db.Index('ix_ticket_creator_id_id', 'creator_id', 'id'),
+        db.Index('ix_ticket_status_id', 'status', 'id'),
+        db.Index('ix_ticket_assignee_id_id', 'assignee_id', 'id'),  # HR queues, and the unassigned pool
+        db.Index('ix_ticket_due_at', 'due_at'),  # SLA breaches (app/escalation.py)
+    )
+
+    @classmethod
+    def not_deleted(cls):
+        return cls.deleted_at.is_(None)
 
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False)
-    author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    ticket = db.relationship('Ticket', backref=db.backref('comments', lazy='dynamic'))
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    ticket = db.relationship('Ticket', backref=db.backref('comments', lazy='dynamic', cascade='all, delete-orphan'))
     author = db.relationship('User', backref='comments')
+
+    __table_args__ = (
+        db.Index('ix_comment_ticket_id_id', 'ticket_id', 'id'),  # a ticket's thread in posting order
+    )
+
+
+class Attachment(db.Model):
+    # Metadata only: the bytes live in the content-addressed store (app/attachments.py),
+    # one file per distinct sha256. No foreign keys, so attachments stay readable
+    # after their ticket moves to the archive tables.
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, nullable=False)
+    comment_id = db.Column(db.Integer, index=True)  # set when uploaded with a comment
+    uploader_id = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_attachment_ticket_id_id', 'ticket_id', 'id'),)
+
+
+class OutboundEmail(db.Model):
+    # Outbox row written in the same transaction as the change that triggers it and
+    # delivered later by the mail worker (see app/mailqueue.py).
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(200), nullable=False)
+    sender = db.Column(db.String(100), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # newline separated
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending / sent / failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_outbound_email_status_next_attempt_at', 'status', 'next_attempt_at'),)
+
+
+class StatCounter(db.Model):
+    # Running totals behind the HR statistics page, kept current by app/stats.py:
+    # 'tickets:<status>', 'comments' and 'open_created_epoch_sum'.
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class DailyTicketCount(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    created = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Ticket history (app/history.py): one row per change, appended in the same
+# transaction as the change and never updated. Kinds and statuses are stored as
+# small codes; a status code is its position in TICKET_STATUSES, counted from 1,
+# so new statuses may only ever be added at the end of that tuple.
+EVENT_CREATED = 1
+EVENT_STATUS = 2
+EVENT_COMMENT = 3
+EVENT_DELETED = 4
+EVENT_BASELINE = 5  # the status a ticket already had when the log was introduced
+EVENT_ESCALATED = 6  # missed its SLA deadline; status holds nothing
+
+
+class TicketEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, nullable=False)  # no foreign key: history outlives archived tickets
+    kind = db.Column(db.SmallInteger, nullable=False)
+    status = db.Column(db.SmallInteger)  # the status entered, on created/status/baseline events
+    actor_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_ticket_event_ticket_id_id', 'ticket_id', 'id'),)  # a ticket's history in order
+
+
+# Duplicate detection (app/similarity.py): a MinHash signature per ticket, and its
+# LSH band hashes, looked up by band to find candidate near-duplicates. Keyed by
+# ticket id without foreign keys, like the event log; archiving removes the rows.
+class TicketSignature(db.Model):
+    ticket_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    minhash = db.Column(db.LargeBinary, nullable=False)  # packed little-endian uint32s
+
+
+class TicketSignatureBand(db.Model):
+    band_key = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    ticket_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    __table_args__ = (db.Index('ix_ticket_signature_band_ticket_id', 'ticket_id'),)  # archiving clears a ticket's bands
+
+
+# Archive tier (app/archive.py): old closed and soft-deleted tickets are moved here,
+# on their own bind so they can live in a separate database. Emails are copied in
+# because the user table may not be in the same database.
+
+class ArchivedTicket(db.Model):
+    __bind_key__ = 'archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # the original ticket id
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20))
+    creator_id = db.Column(db.Integer, nullable=False)
+    creator_email = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    deleted_at = db.Column(db.DateTime)
+    # NULL on tickets archived before these were kept.
+    priority = db.Column(db.String(10))
+    category = db.Column(db.String(20))
+    assignee_id = db.Column(db.Integer)
+    due_at = db.Column(db.DateTime)
+    sla_started_at = db.Column(db.DateTime)
+    escalated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @classmethod
+    def not_deleted(cls):
+        return cls.deleted_at.is_(None)
+
+
+class ArchivedComment(db.Model):
+    __bind_key__ = 'archive'
+    id = db.Column(db.Integer, primary_key=True)
+    comment_id = db.Column(db.Integer, nullable=False)  # the original id, which SQLite may hand out again
+    ticket_id = db.Column(db.Integer, nullable=False)
+    author_id = db.Column(db.Integer, nullable=False)
+    author_email = db.Column(db.String(100))
+    content = db.Column(db.Text, nullable=False)
+
+    __table_args__ = (db.Index('ix_archived_comment_ticket_id_id', 'ticket_id', 'id'),)
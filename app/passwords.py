@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.extension import db
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when every hashing slot stayed taken for PASSWORD_HASH_QUEUE_TIMEOUT."""
+
+
+class PasswordHasher:
+    """The one place passwords are hashed and checked.
+
+    PASSWORD_HASH_METHOD is any werkzeug method string ('scrypt:32768:8:1',
+    'pbkdf2:sha256:600000', ...), so the work factor is tuned in config. The hashing
+    itself runs on a fixed pool of PASSWORD_HASH_WORKERS threads, with at most
+    PASSWORD_HASH_QUEUE more callers waiting; hashlib releases the GIL, so a login
+    storm uses that many cores and no more.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1'):
+        self.method = method
+        self.queue_timeout = None
+        self._executor = None
+        self._slots = None
+        self._prefix = None
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.queue_timeout = app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        workers = app.config['PASSWORD_HASH_WORKERS']
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_QUEUE'])
+        self._prefix = None
+
+    def _run(self, function, *args):
+        if self._executor is None:  # outside the app, e.g. a one-off script
+            return function(*args)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHasherBusy()
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    @property
+    def prefix(self):
+        # What werkzeug writes before the salt for the configured method, with its
+        # defaults filled in (e.g. 'pbkdf2' -> 'pbkdf2:sha256:600000'). Worked out once.
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', self.method, salt_length=1).split('$', 1)[0]
+        return self._prefix
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.prefix
+
+
+hasher = PasswordHasher()
+
+
+def hash_password(password):
+    return hasher.hash(password)
+
+
+def verify_password(password_hash, password):
+    return hasher.verify(password_hash, password)
+
+
+def check_user_password(user, password):
+    """Verify a login and move the stored hash to the current policy if it is older."""
+    if not verify_password(user.password_hash, password):
+        return False
+    if hasher.needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+        db.session.commit()
+    return True
+
+
+def init_app(app):
+    hasher.init_app(app)
@@ -0,0 +1,124 @@
+from collections import namedtuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from app.extension import db
+from app.models import ArchivedComment, ArchivedTicket, Comment, Ticket, User
+
+
+# A page of keyset-paginated rows plus the cursors needed to move either way.
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+DESCRIPTION_PREVIEW_LENGTH = 120
+UNASSIGNED = 'unassigned'
+
+
+def keyset_page(query, column, per_page, after=None, before=None, descending=True):
+    # `after` walks forwards through the ordering, `before` back towards its start;
+    # neither needs an OFFSET, so every page costs the same index seek.
+    def beyond(cursor):
+        return column < cursor if descending else column > cursor
+
+    def short_of(cursor):
+        return column > cursor if descending else column < cursor
+
+    forward, backward = (column.desc(), column.asc()) if descending else (column.asc(), column.desc())
+    if before is not None:
+        rows = query.filter(short_of(before)).order_by(backward).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        next_cursor = rows[-1].id if rows else None
+        prev_cursor = rows[0].id if rows and has_more else None
+    else:
+        if after is not None:
+            query = query.filter(beyond(after))
+        rows = query.order_by(forward).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = rows[-1].id if rows and has_more else None
+        prev_cursor = rows[0].id if rows and after is not None else None
+    return Page(rows, next_cursor, prev_cursor)
+
+
+def assignee_criterion(assignee):
+    # A user id, or UNASSIGNED for the pool nobody has claimed yet.
+    return Ticket.assignee_id.is_(None) if assignee == UNASSIGNED else Ticket.assignee_id == assignee
+
+
+def ticket_list_query(creator_id=None, status=None, assignee=None, priority=None):
+    # Dashboard projection: leaves the full description text in the database and
+    # only pulls a short preview of it.
+    query = db.session.query(
+        Ticket.id,
+        Ticket.title,
+        Ticket.status,
+        Ticket.priority,
+        Ticket.category,
+        Ticket.creator_id,
+        Ticket.updated_at,  # versions the cached dashboard row
+        func.substr(Ticket.description, 1, DESCRIPTION_PREVIEW_LENGTH).label('summary'),
+    ).filter(Ticket.not_deleted())
+    if creator_id is not None:
+        query = query.filter(Ticket.creator_id == creator_id)
+    if status:
+        query = query.filter(Ticket.status == status)
+    if assignee is not None:
+        query = query.filter(assignee_criterion(assignee))
+    if priority:
+        query = query.filter(Ticket.priority == priority)
+    return query
+
+
+def dashboard_filters(user, args, default_assignee='all'):
+    """Resolve the dashboard's filter into (creator_id, status, assignee, priority).
+
+    HR choose between their own queue ('me'), UNASSIGNED and 'all'.
+    """
+    status, priority = args.get('status') or None, args.get('priority') or None
+    creator_id = assignee = None
+    if not user.is_hr:
+        creator_id = user.id  # Associates see only their tickets
+    else:
+        if args.get('creator'):
+            creator = db.session.query(User.id).filter_by(email=args['creator']).first()
+            creator_id = creator.id if creator else -1
+        choice = args.get('assignee') or default_assignee
+        if choice == 'me':
+            assignee = user.id
+        elif choice == UNASSIGNED:
+            assignee = UNASSIGNED
+    return creator_id, status, assignee, priority
+
+
+def dashboard_page(user, args, per_page):
+    # HR land on their own queue, which stays small however large the table grows.
+    creator_id, status, assignee, priority = dashboard_filters(user, args, default_assignee='me')
+    query = ticket_list_query(creator_id=creator_id, status=status, assignee=assignee, priority=priority)
+    return keyset_page(query, Ticket.id, per_page,
+                       after=args.get('after', type=int), before=args.get('before', type=int))
+
+
+def live_ticket_or_404(ticket_id):
+    return Ticket.query.filter(Ticket.id == ticket_id, Ticket.not_deleted()).first_or_404()
+
+
+def find_archived_ticket(ticket_id):
+    # Tickets `flask archive run` has moved out of the hot tables.
+    return db.session.get(ArchivedTicket, ticket_id)
+
+
+def comment_page(ticket_id, args, per_page):
+    # Oldest first, with each author's email joined in so the thread renders from
+    # a single query however many people took part.
+    query = Comment.query.options(joinedload(Comment.author).load_only(User.email)).filter(
+        Comment.ticket_id == ticket_id)
+    return keyset_page(query, Comment.id, per_page, descending=False,
+                       after=args.get('after', type=int), before=args.get('before', type=int))
+
+
+def archived_comment_page(ticket_id, args, per_page):
+    # Author emails were copied in at archive time, so this is a single-table read.
+    query = ArchivedComment.query.filter(ArchivedComment.ticket_id == ticket_id)
+    return keyset_page(query, ArchivedComment.id, per_page, descending=False,
+                       after=args.get('after', type=int), before=args.get('before', type=int))
@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(value):
+    """'10/minute' -> (capacity 10, refill rate in tokens per second); None when unset."""
+    if not value:
+        return None
+    count, _, period = value.partition('/')
+    return int(count), int(count) / PERIODS[period.strip().rstrip('s')]
+
+
+class MemoryBackend:
+    # Process-local token buckets; the least recently used ones are dropped past maxsize.
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        """Take one token; returns seconds until one is available, or 0 if it was taken."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+# Refill and take in one round trip, timed by the Redis clock so workers on
+# different hosts agree.
+TAKE_SCRIPT = '''
+local capacity, rate = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = clock[1] + clock[2] / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+'''
+
+
+class RedisBackend:
+    # Buckets shared by every worker process, so the limits hold for the whole deployment.
+
+    def __init__(self, url, prefix='ticketing:ratelimit:'):
+        import redis  # optional dependency, only needed when RATE_LIMIT_URL points at Redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, capacity, rate):
+        return float(self._take(keys=[self.prefix + key], args=[capacity, rate]))
+
+
+class Limiter:
+    """Token buckets per client IP and per account for the endpoints that hash
+    passwords or create tickets.
+
+    Each endpoint name has a RATE_LIMIT_<NAME>_IP and a RATE_LIMIT_<NAME>_ACCOUNT
+    setting such as '10/minute': that many requests at once, refilled evenly over
+    the period. An empty setting turns that bucket off.
+    """
+
+    def __init__(self):
+        self.backend = MemoryBackend()
+        self.enabled = True
+        self.limits = {}
+
+    def init_app(self, app):
+        url = app.config.get('RATE_LIMIT_URL')
+        self.backend = RedisBackend(url) if url else MemoryBackend()
+        self.enabled = app.config['RATE_LIMIT_ENABLED']
+        self.limits = {}
+
+    def _limit(self, setting):
+        if setting not in self.limits:
+            self.limits[setting] = parse_limit(current_app.config.get(setting))
+        return self.limits[setting]
+
+    def check(self, name, account=None):
+        """Raise TooManyRequests unless both of the caller's buckets for `name` have a token."""
+        if not self.enabled:
+            return
+        buckets = [('IP', request.remote_addr)]
+        if account is not None:
+            buckets.append(('ACCOUNT', str(account).lower()))
+        for scope, key in buckets:
+            limit = self._limit(f'RATE_LIMIT_{name.upper()}_{scope}')
+            if limit is None:
+                continue
+            wait = self.backend.take(f'{name}:{scope.lower()}:{key}', *limit)
+            if wait:
+                raise TooManyRequests('Too many attempts, please try again later.', retry_after=max(1, round(wait)))
+
+
+limiter = Limiter()
+
+
+class AdmissionControl:
+    """Caps how many expensive requests (password hashing) a process works on at once.
+
+    A request that cannot get a slot within ADMISSION_QUEUE_TIMEOUT seconds gets a
+    503 with Retry-After instead of piling up in front of the workers. Unlike the
+    token buckets there is no shared backend: each process guards its own hashing
+    pool, so N workers admit N * ADMISSION_MAX_CONCURRENT requests in total.
+    """
+
+    def __init__(self):
+        self._slots = None
+        self.timeout = 0
+
+    def init_app(self, app):
+        self._slots = threading.BoundedSemaphore(app.config['ADMISSION_MAX_CONCURRENT'])
+        self.timeout = app.config['ADMISSION_QUEUE_TIMEOUT']
+
+    def acquire(self):
+        if self._slots is not None and not self._slots.acquire(timeout=self.timeout):
+            raise ServiceUnavailable('The server is busy, please try again in a moment.', retry_after=5)
+
+    def release(self):
+        if self._slots is not None:
+            self._slots.release()
+
+
+admission = AdmissionControl()
+
+
+def rate_limited(name, account=None, expensive=False):
+    """Throttle POSTs to a view by IP and by `account()`, e.g. the submitted email.
+
+    `expensive` views also take an admission slot for the length of the request.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if request.method != 'POST':  # showing the form costs nothing
+                return view(*args, **kwargs)
+            limiter.check(name, account() if account else None)
+            if not expensive:
+                return view(*args, **kwargs)
+            admission.acquire()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                admission.release()
+        return wrapped
+    return decorator
+
+
+def submitted_email():
+    return request.form.get('email') or None
+
+
+def init_app(app):
+    limiter.init_app(app)
+    admission.init_app(app)
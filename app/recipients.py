@@ -0,0 +1,31 @@
+from app.cache import Cache
+from app.extension import db
+from app.models import User
+
+
+# Approved HR accounts: the addresses notified on ticket creation and the ids new
+# tickets are assigned to. They change only when HR accounts are signed up,
+# approved or rejected, and those paths invalidate them.
+hr_recipient_cache = Cache('hr_recipients', maxsize=2, ttl=3600)
+
+
+def _load_hr_recipients():
+    rows = db.session.query(User.email).filter_by(is_hr=True, is_approved=True).order_by(User.id).all()
+    return [email for (email,) in rows]
+
+
+def _load_hr_assignees():
+    return [id for (id,) in db.session.query(User.id).filter_by(is_hr=True, is_approved=True).order_by(User.id)]
+
+
+def hr_recipients():
+    return hr_recipient_cache.get_or_set('emails', _load_hr_recipients)
+
+
+def hr_assignees():
+    return hr_recipient_cache.get_or_set('ids', _load_hr_assignees)
+
+
+def invalidate_hr_recipients():
+    hr_recipient_cache.delete('emails')
+    hr_recipient_cache.delete('ids')
@@ -0,0 +1,153 @@
+import re
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+from app.extension import db
+from app.queries import DESCRIPTION_PREVIEW_LENGTH
+
+
+# SQLite: external-content FTS5 tables hold only the index and read the text back
+# from ticket/comment. Triggers keep them in sync with every write, whichever code
+# path (view, bulk import, archive job) makes it.
+SQLITE_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ticket_fts USING fts5("
+    "title, description, content='ticket', content_rowid='id')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5("
+    "content, content='comment', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS ticket_fts_insert AFTER INSERT ON ticket BEGIN
+        INSERT INTO ticket_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_fts_delete AFTER DELETE ON ticket BEGIN
+        INSERT INTO ticket_fts(ticket_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_fts_update AFTER UPDATE OF title, description ON ticket BEGIN
+        INSERT INTO ticket_fts(ticket_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO ticket_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_insert AFTER INSERT ON comment BEGIN
+        INSERT INTO comment_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_delete AFTER DELETE ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_update AFTER UPDATE OF content ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO comment_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+SQLITE_REBUILD = [
+    "INSERT INTO ticket_fts(ticket_fts) VALUES ('rebuild')",
+    "INSERT INTO comment_fts(comment_fts) VALUES ('rebuild')",
+]
+
+# PostgreSQL: GIN indexes over the same tsvector expressions the search query
+# uses, so the planner can serve it from the index with nothing extra to sync.
+TICKET_TSVECTOR = "to_tsvector('english', ticket.title || ' ' || ticket.description)"
+COMMENT_TSVECTOR = "to_tsvector('english', comment.content)"
+
+POSTGRESQL_SCHEMA = [
+    f"CREATE INDEX IF NOT EXISTS ix_ticket_fts ON ticket USING gin (({TICKET_TSVECTOR}))",
+    f"CREATE INDEX IF NOT EXISTS ix_comment_fts ON comment USING gin (({COMMENT_TSVECTOR}))",
+]
+
+SEARCH_TABLES = ('ticket_fts', 'comment_fts')
+
+SQLITE_SEARCH = f"""
+    SELECT ticket.id, ticket.title, ticket.status,
+           substr(ticket.description, 1, {DESCRIPTION_PREVIEW_LENGTH}) AS summary
+    FROM (
+        SELECT ticket_id, MIN(score) AS score FROM (
+            SELECT rowid AS ticket_id, bm25(ticket_fts, 10.0, 1.0) AS score
+            FROM ticket_fts WHERE ticket_fts MATCH :query
+            UNION ALL
+            SELECT comment.ticket_id, bm25(comment_fts) AS score
+            FROM comment_fts JOIN comment ON comment.id = comment_fts.rowid
+            WHERE comment_fts MATCH :query
+        ) GROUP BY ticket_id
+    ) AS hits JOIN ticket ON ticket.id = hits.ticket_id
+    {{visibility}}
+    ORDER BY hits.score, ticket.id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+POSTGRESQL_SEARCH = f"""
+    SELECT ticket.id, ticket.title, ticket.status,
+           substr(ticket.description, 1, {DESCRIPTION_PREVIEW_LENGTH}) AS summary
+    FROM (
+        SELECT ticket_id, MAX(score) AS score FROM (
+            SELECT ticket.id AS ticket_id, ts_rank({TICKET_TSVECTOR}, q) * 2 AS score
+            FROM ticket, websearch_to_tsquery('english', :query) AS q
+            WHERE {TICKET_TSVECTOR} @@ q
+            UNION ALL
+            SELECT comment.ticket_id, ts_rank({COMMENT_TSVECTOR}, q) AS score
+            FROM comment, websearch_to_tsquery('english', :query) AS q
+            WHERE {COMMENT_TSVECTOR} @@ q
+        ) AS matches GROUP BY ticket_id
+    ) AS hits JOIN ticket ON ticket.id = hits.ticket_id
+    {{visibility}}
+    ORDER BY hits.score DESC, ticket.id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Keeps Alembic autogenerate from proposing to drop the FTS5 tables and their
+    # shadow tables, which are not part of the model metadata.
+    if type_ == 'table' and name.startswith(SEARCH_TABLES):
+        return False
+    return True
+
+
+def create_search_index(connection):
+    dialect = connection.dialect.name
+    statements = {'sqlite': SQLITE_SCHEMA, 'postgresql': POSTGRESQL_SCHEMA}.get(dialect, [])
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def sqlite_match_expression(query):
+    # Quote every word so user input can never be parsed as FTS5 syntax; the last
+    # word is matched as a prefix for search-as-you-type.
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    quoted = ['"%s"' % word for word in words]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_tickets(user, query, page, per_page):
+    """Return (rows, has_next) for one page of ranked matches visible to `user`."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        sql, query = SQLITE_SEARCH, sqlite_match_expression(query)
+    elif dialect == 'postgresql':
+        sql, query = POSTGRESQL_SEARCH, query.strip()
+    else:
+        raise RuntimeError(f'Full-text search is not available on {dialect}')
+    if not query:
+        return [], False
+    params = {'query': query, 'limit': per_page + 1, 'offset': (page - 1) * per_page}
+    visibility = 'WHERE ticket.deleted_at IS NULL'
+    if not user.is_hr:  # the same rule view_ticket() applies
+        visibility += ' AND ticket.creator_id = :user_id'
+        params['user_id'] = user.id
+    rows = db.session.execute(text(sql.format(visibility=visibility)), params).all()
+    return rows[:per_page], len(rows) > per_page
+
+
+@click.command('search-reindex')
+@with_appcontext
+def search_reindex():
+    """Create the full-text index if needed and rebuild it from the tables."""
+    with db.engine.begin() as connection:
+        create_search_index(connection)
+        if connection.dialect.name == 'sqlite':
+            for statement in SQLITE_REBUILD:
+                connection.execute(text(statement))
+    click.echo('Search index rebuilt.')
@@ -0,0 +1,224 @@
+from datetime import datetime
+
+from sqlalchemy import case, delete, select, update
+
+from app import assignment, attachments, escalation, events, history, similarity
+from app.extension import db
+from app.mailqueue import enqueue_mail, notify_mail_worker
+from app.models import Comment, OPEN_STATUSES, Ticket, User
+from app.queries import assignee_criterion
+from app.recipients import hr_recipients, invalidate_hr_recipients
+from app.stats import StatsDelta, epoch, grouped_by_status
+from app.usercache import invalidate_user
+
+
+# Keeps IN lists well under SQLite's bound-parameter limit.
+BULK_CHUNK_SIZE = 500
+
+
+# Ticket mutations shared by the HTML views and the JSON API. Each one commits its
+# own transaction, so everything a change implies (outbox mail, statistics
+# counters) is written atomically with it.
+
+
+def create_ticket(creator, title, description, files=(), priority='Normal', category='Other'):
+    stored = attachments.store_uploads(files)  # before any database work, so a rejected file aborts cleanly
+    now = datetime.utcnow()
+    ticket = Ticket(title=title, description=description, creator_id=creator.id, status='New',
+                    priority=priority, category=category, due_at=escalation.deadline(priority, now),
+                    sla_started_at=now, created_at=now, updated_at=now, assignee_id=assignment.choose_assignee())
+    db.session.add(ticket)
+    db.session.flush()  # the history row and attachments need the ticket id
+    history.ticket_created(ticket, creator)
+    attachments.attachment_rows(stored, creator, ticket.id)
+    similarity.index_tickets([(ticket.id, title, description)])
+    stats = StatsDelta()
+    stats.ticket_created(ticket)
+    stats.apply()
+
+    hr_emails = hr_recipients()
+    if hr_emails:
+        # Queued in the same transaction as the ticket and sent by the mail worker,
+        # so a slow or unreachable MAIL_SERVER never blocks this request.
+        enqueue_mail('New Ticket Created', sender=creator.email, recipients=hr_emails, body=f'''
+                    Dear HR,
+
+                    A new ticket has been created with the following details:
+                    Title: {title}
+                    Description: {description}
+                    Creator: {creator.email}
+
+                    Please check the HR dashboard for more details.
+
+                    Best regards,
+                    Your Company
+                    ''')
+
+    db.session.commit()
+    notify_mail_worker()
+    return ticket
+
+
+def add_comment(ticket, author, content, files=()):
+    stored = attachments.store_uploads(files)
+    comment = Comment(content=content, ticket_id=ticket.id, author_id=author.id)
+    db.session.add(comment)
+    if stored:
+        db.session.flush()
+        attachments.attachment_rows(stored, author, ticket.id, comment.id)
+    ticket.updated_at = datetime.utcnow()
+    history.comment_added(ticket, author)
+    stats = StatsDelta()
+    stats.comments(1)
+    stats.apply()
+    db.session.commit()
+    events.publish_comment(ticket.id, ticket.creator_id, comment.id, author.email, content)
+    return comment
+
+
+def add_attachments(ticket, uploader, files):
+    stored = attachments.store_uploads(files)
+    rows = attachments.attachment_rows(stored, uploader, ticket.id)
+    ticket.updated_at = datetime.utcnow()
+    db.session.commit()
+    return rows
+
+
+def change_status(ticket, status, actor=None):
+    if ticket.status != status:  # counters, history and viewers only hear about real transitions
+        stats = StatsDelta()
+        stats.status_changed(ticket.status, status, 1, epoch(ticket.created_at))
+        stats.apply()
+        history.status_changed(ticket, status, actor)
+    changed = ticket.status != status
+    if status not in OPEN_STATUSES:
+        ticket.due_at = None
+    elif ticket.status not in OPEN_STATUSES:  # reopened: a fresh SLA clock
+        ticket.sla_started_at, ticket.escalated_at = datetime.utcnow(), None
+        ticket.due_at = escalation.deadline(ticket.priority, ticket.sla_started_at)
+    ticket.status = status
+    db.session.commit()
+    if changed:
+        events.publish_status(ticket.id, ticket.creator_id, status)
+    return ticket
+
+
+def change_priority(ticket, priority):
+    ticket.priority = priority
+    if ticket.status in OPEN_STATUSES and ticket.escalated_at is None:
+        # Same clock, new target; tickets from before the clock was recorded start theirs now.
+        ticket.sla_started_at = ticket.sla_started_at or datetime.utcnow()
+        ticket.due_at = escalation.deadline(priority, ticket.sla_started_at)
+    db.session.commit()
+    return ticket
+
+
+def claim_next_ticket(user):
+    """Assign the oldest open unassigned ticket to `user`; returns it, or None if the pool is empty."""
+    ticket_id = assignment.claim_next(user.id)
+    db.session.commit()
+    return db.session.get(Ticket, ticket_id) if ticket_id is not None else None
+
+
+def delete_ticket(ticket, actor=None):
+    # Soft delete: the row drops out of every listing now and is moved to the
+    # archive tables by `flask archive run` after ARCHIVE_DELETED_AFTER_DAYS.
+    stats = StatsDelta()
+    stats.ticket_deleted(ticket, ticket.comments.count())
+    stats.apply()
+    ticket.deleted_at = datetime.utcnow()
+    ticket.due_at = None
+    history.ticket_deleted(ticket, actor)
+    db.session.commit()
+
+
+def _chunks(ids):
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), BULK_CHUNK_SIZE):
+        yield ids[start:start + BULK_CHUNK_SIZE]
+
+
+def _apply_bulk(statement, id_column, ids, criteria, before=None, scope=()):
+    """Run a set-based UPDATE/DELETE ... RETURNING over `ids`, or over everything
+    matching `criteria` when ids is None, and sort the targets into a summary.
+
+    The statement returns (id, value) pairs; they come back as a dict alongside the
+    summary. `before` is called with the extra WHERE clause of each statement just
+    before it runs. Rows outside `scope` are reported as not found.
+    """
+    options = {'synchronize_session': False}
+    if ids is None:
+        matching = set(db.session.scalars(select(id_column).where(*scope, *criteria)))
+        if before:
+            before([])
+        changed = dict(db.session.execute(statement, execution_options=options).all())
+        not_found = set()
+    else:
+        matching, changed = set(), {}
+        for chunk in _chunks(ids):
+            matching.update(db.session.scalars(select(id_column).where(*scope, id_column.in_(chunk))))
+            if before:
+                before([id_column.in_(chunk)])
+            changed.update(db.session.execute(statement.where(id_column.in_(chunk)), execution_options=options).all())
+        not_found = set(ids) - matching
+    db.session.commit()
+    summary = {'updated': sorted(changed), 'unchanged': sorted(matching - changed.keys()),
+               'not_found': sorted(not_found)}
+    return summary, changed
+
+
+def bulk_change_status(status, ticket_ids=None, creator_id=None, current_status=None, actor=None, assignee=None,
+                       priority=None):
+    """Move the given tickets, or every ticket matching the filter, to `status`.
+
+    Returns the ticket ids that were updated, were already in `status`, or do not exist.
+    """
+    criteria = [Ticket.not_deleted()]
+    if creator_id is not None:
+        criteria.append(Ticket.creator_id == creator_id)
+    if current_status:
+        criteria.append(Ticket.status == current_status)
+    if assignee is not None:
+        criteria.append(assignee_criterion(assignee))
+    if priority:
+        criteria.append(Ticket.priority == priority)
+    stats = StatsDelta()
+
+    def count_moves(chunk):
+        # What each UPDATE is about to move, grouped so the counters take one row per status,
+        # and a history row per ticket.
+        for old, count, created_sum in grouped_by_status(Ticket.status != status, *criteria, *chunk):
+            stats.status_changed(old, status, count, int(created_sum))
+        stats.apply()
+        history.statuses_changed(status, actor, [Ticket.status != status, *criteria, *chunk])
+
+    now = datetime.utcnow()
+    if status in OPEN_STATUSES:  # tickets coming back from Resolved/Closed get a fresh SLA clock
+        reopened = Ticket.status.not_in(OPEN_STATUSES)
+        deadlines = {'due_at': case((reopened, escalation.deadline_expression(now)), else_=Ticket.due_at),
+                     'sla_started_at': case((reopened, now), else_=Ticket.sla_started_at),
+                     'escalated_at': case((reopened, None), else_=Ticket.escalated_at)}
+    else:
+        deadlines = {'due_at': None}
+    statement = (update(Ticket).where(Ticket.status != status, *criteria)
+                 .values(status=status, updated_at=now, **deadlines).returning(Ticket.id, Ticket.creator_id))
+    summary, changed = _apply_bulk(statement, Ticket.id, ticket_ids, criteria, before=count_moves,
+                                   scope=[Ticket.not_deleted()])
+    for ticket_id, creator_id in changed.items():
+        events.publish_status(ticket_id, creator_id, status)
+    return summary
+
+
+def bulk_review_hr(approve, user_ids=None):
+    """Approve, or reject and delete, pending HR sign-ups (all of them when user_ids is None).
+
+    Users that exist but are not pending HR sign-ups are reported as unchanged.
+    """
+    pending = [User.is_hr.is_(True), User.is_approved.is_(False)]
+    statement = update(User).values(is_approved=True) if approve else delete(User)
+    result, _ = _apply_bulk(statement.where(*pending).returning(User.id, User.email), User.id, user_ids, pending)
+    if result['updated']:
+        invalidate_hr_recipients()
+        for user_id in result['updated']:
+            invalidate_user(user_id)
+    return result
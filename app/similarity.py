@@ -0,0 +1,149 @@
+import hashlib
+import re
+import struct
+from collections import Counter, namedtuple
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, insert, select
+
+from app.extension import db
+from app.models import OPEN_STATUSES, Ticket, TicketSignature, TicketSignatureBand
+
+
+# Near-duplicate detection with MinHash and locality-sensitive hashing.
+#
+# A ticket's text is reduced to a set of normalised words; NUM_PERM independent
+# hash functions (slices of a few keyed blake2b digests per word) each keep the
+# minimum over that set, and two signatures agree in a position with probability
+# equal to the Jaccard similarity of the two sets. The signature is cut into BANDS
+# bands of ROWS values, each hashed to a band key: tickets sharing any band key
+# become candidates (likely above about (1/BANDS)**(1/ROWS), ~0.37 here), which one
+# indexed IN lookup finds however many tickets there are. Candidates are then
+# scored by comparing full signatures. Changing any of these constants needs
+# `flask duplicates reindex`.
+
+duplicates_cli = AppGroup('duplicates', help='Duplicate-ticket similarity index.')
+
+BANDS, ROWS = 20, 3
+NUM_PERM = BANDS * ROWS
+MAX_TEXT_LENGTH = 4000  # long descriptions add little beyond their start
+MAX_CANDIDATES = 500  # scored per lookup; also keeps the IN list within SQLite's parameter limit
+_PACK = struct.Struct(f'<{NUM_PERM}I')
+_DIGESTS = [b'ticket-minhash-%d' % i for i in range(-(-_PACK.size // 64))]  # blake2b personalisations
+
+STOPWORDS = frozenset('''
+    a an and are as at be but by can cannot could do does for from has have i in is it its me my no not of on or
+    our please so that the their there this to was we when where which while with without you your
+'''.split())
+
+Match = namedtuple('Match', ['id', 'title', 'status', 'score'])
+
+
+def _stem(word):
+    # Crude suffix stripping, enough for 'connecting'/'connects'/'connected' to meet.
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def shingles(title, description):
+    text = f'{title} {description[:MAX_TEXT_LENGTH]}'.lower()
+    return {_stem(word) for word in re.findall(r'\w+', text) if word not in STOPWORDS and len(word) > 1}
+
+
+def _hashes(shingle):
+    data = shingle.encode()
+    digest = b''.join(hashlib.blake2b(data, person=person).digest() for person in _DIGESTS)
+    return _PACK.unpack_from(digest)
+
+
+def signature(title, description):
+    """The MinHash signature of a ticket's text as a tuple of NUM_PERM ints, or None if it has no words."""
+    hashes = [_hashes(shingle) for shingle in shingles(title, description)]
+    if not hashes:
+        return None
+    return tuple(map(min, zip(*hashes)))
+
+
+def band_keys(minhash):
+    keys = []
+    for band in range(BANDS):
+        values = struct.pack(f'<H{ROWS}I', band, *minhash[band * ROWS:(band + 1) * ROWS])
+        keys.append(int.from_bytes(hashlib.blake2b(values, digest_size=8).digest(), 'little', signed=True))
+    return keys
+
+
+def index_tickets(rows):
+    """Add (ticket_id, title, description) rows to the index; does not commit."""
+    signatures, bands = [], []
+    for ticket_id, title, description in rows:
+        minhash = signature(title, description)
+        if minhash is None:
+            continue
+        signatures.append({'ticket_id': ticket_id, 'minhash': _PACK.pack(*minhash)})
+        bands.extend({'band_key': key, 'ticket_id': ticket_id} for key in set(band_keys(minhash)))
+    if signatures:
+        db.session.execute(insert(TicketSignature), signatures)
+        db.session.execute(insert(TicketSignatureBand), bands)
+
+
+def remove_tickets(ticket_ids):
+    db.session.execute(delete(TicketSignatureBand).where(TicketSignatureBand.ticket_id.in_(ticket_ids)))
+    db.session.execute(delete(TicketSignature).where(TicketSignature.ticket_id.in_(ticket_ids)))
+
+
+def similar_tickets(user, title, description, threshold=None, limit=None):
+    """Open tickets visible to `user` whose text is likely a near-duplicate, best first."""
+    config = current_app.config
+    threshold = config['DUPLICATE_THRESHOLD'] if threshold is None else threshold
+    limit = limit or config['DUPLICATE_MAX_RESULTS']
+    minhash = signature(title or '', description or '')
+    if minhash is None:
+        return []
+    visible = [Ticket.status.in_(OPEN_STATUSES), Ticket.not_deleted()]
+    if not user.is_hr:  # the same rule view_ticket() applies
+        visible.append(Ticket.creator_id == user.id)
+    # Two steps, so the planner cannot start from the (large) set of open tickets:
+    # band hits from the primary key alone, then the best-placed candidates by id.
+    # Tickets sharing more bands are the more similar ones, so the cap keeps the best.
+    hits = Counter(db.session.scalars(select(TicketSignatureBand.ticket_id)
+                                      .where(TicketSignatureBand.band_key.in_(set(band_keys(minhash))))))
+    if not hits:
+        return []
+    rows = db.session.execute(
+        select(Ticket.id, Ticket.title, Ticket.status, TicketSignature.minhash)
+        .join(TicketSignature, TicketSignature.ticket_id == Ticket.id)
+        .where(Ticket.id.in_([ticket_id for ticket_id, _ in hits.most_common(MAX_CANDIDATES)]), *visible)).all()
+    matches = []
+    for id, title, status, packed in rows:
+        score = sum(a == b for a, b in zip(minhash, _PACK.unpack(packed))) / NUM_PERM
+        if score >= threshold:
+            matches.append(Match(id, title, status, round(score, 2)))
+    matches.sort(key=lambda match: (-match.score, -match.id))
+    return matches[:limit]
+
+
+@duplicates_cli.command('reindex')
+@click.option('--batch-size', default=1000, show_default=True)
+def reindex_command(batch_size):
+    """Rebuild the similarity index from every live ticket."""
+    db.session.execute(delete(TicketSignatureBand))
+    db.session.execute(delete(TicketSignature))
+    indexed, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            select(Ticket.id, Ticket.title, Ticket.description)
+            .where(Ticket.not_deleted(), Ticket.id > last_id).order_by(Ticket.id).limit(batch_size)).all()
+        if not rows:
+            break
+        index_tickets(rows)
+        indexed, last_id = indexed + len(rows), rows[-1].id
+    db.session.commit()
+    click.echo(f'Indexed {indexed} tickets.')
+
+
+def init_app(app):
+    app.cli.add_command(duplicates_cli)
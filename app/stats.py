@@ -0,0 +1,179 @@
+import importlib
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, extract, func, insert, select, update
+
+from app.extension import db
+from app.models import (ArchivedComment, ArchivedTicket, Comment, DailyTicketCount, OPEN_STATUSES, StatCounter,
+                        Ticket, TICKET_STATUSES)
+
+
+stats_cli = AppGroup('stats', help='Materialized ticket statistics.')
+
+EPOCH = datetime(1970, 1, 1)
+OPEN_CREATED_SUM = 'open_created_epoch_sum'  # lets the mean open-ticket age come from two counters
+COMMENTS = 'comments'
+
+
+def epoch(value):
+    return int((value - EPOCH).total_seconds())
+
+
+def status_counter(status):
+    return f'tickets:{status}'
+
+
+class StatsDelta:
+    """Counter changes collected during one transaction and written with it.
+
+    Every service that changes tickets or comments records what it did here and
+    calls apply() before committing, so the totals move atomically with the data.
+    """
+
+    def __init__(self):
+        self.counters = Counter()
+        self.daily = Counter()
+
+    def tickets(self, status, count, created_epoch_sum):
+        # Negative counts remove tickets from `status`.
+        self.counters[status_counter(status)] += count
+        if status in OPEN_STATUSES:
+            self.counters[OPEN_CREATED_SUM] += created_epoch_sum
+
+    def created(self, day, count):
+        self.daily[day] += count
+
+    def comments(self, count):
+        self.counters[COMMENTS] += count
+
+    def ticket_created(self, ticket):
+        self.tickets(ticket.status, 1, epoch(ticket.created_at))
+        self.created(ticket.created_at.date(), 1)
+
+    def ticket_deleted(self, ticket, comment_count):
+        self.tickets(ticket.status, -1, -epoch(ticket.created_at))
+        self.created(ticket.created_at.date(), -1)
+        self.comments(-comment_count)
+
+    def status_changed(self, old, new, count, created_epoch_sum):
+        self.tickets(old, -count, -created_epoch_sum)
+        self.tickets(new, count, created_epoch_sum)
+
+    def apply(self):
+        counters = [{'name': name, 'value': value} for name, value in self.counters.items() if value]
+        daily = [{'day': day, 'created': value} for day, value in self.daily.items() if value]
+        if counters:
+            _increment(StatCounter.__table__, 'name', 'value', counters)
+        if daily:
+            _increment(DailyTicketCount.__table__, 'day', 'created', daily)
+        self.counters.clear()
+        self.daily.clear()
+
+
+def _increment(table, key, column, rows):
+    # One executemany of INSERT ... ON CONFLICT DO UPDATE SET value = value + delta.
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        # Imported on first use, so workers only load the dialect they actually talk to.
+        statement = importlib.import_module(f'sqlalchemy.dialects.{dialect}').insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[key], set_={column: table.c[column] + statement.excluded[column]})
+        db.session.execute(statement, rows)
+        return
+    for row in rows:
+        result = db.session.execute(update(table).where(table.c[key] == row[key])
+                                    .values({column: table.c[column] + row[column]}))
+        if not result.rowcount:
+            db.session.execute(insert(table).values(row))
+
+
+def grouped_by_status(*criteria, model=Ticket):
+    """(status, count, created epoch sum) for the tickets matching `criteria`."""
+    return db.session.execute(
+        select(model.status, func.count(), func.coalesce(func.sum(extract('epoch', model.created_at)), 0))
+        .where(*criteria).group_by(model.status)).all()
+
+
+def ticket_statistics(days=30):
+    """Everything the statistics page shows, read from the summary tables only."""
+    today = datetime.utcnow().date()
+    since = today - timedelta(days=days - 1)
+    counters = dict(db.session.execute(select(StatCounter.name, StatCounter.value)).all())
+    daily = dict(db.session.execute(
+        select(DailyTicketCount.day, DailyTicketCount.created).where(DailyTicketCount.day >= since)).all())
+
+    by_status = {status: counters.get(status_counter(status), 0) for status in TICKET_STATUSES}
+    for name, value in counters.items():  # statuses outside TICKET_STATUSES, e.g. imported ones
+        if name.startswith('tickets:') and name[len('tickets:'):] not in by_status and value:
+            by_status[name[len('tickets:'):]] = value
+    total = sum(by_status.values())
+    open_count = sum(by_status.get(status, 0) for status in OPEN_STATUSES)
+    mean_open_age = None
+    if open_count:
+        mean_created = counters.get(OPEN_CREATED_SUM, 0) / open_count
+        mean_open_age = timedelta(seconds=max(0, epoch(datetime.utcnow()) - mean_created))
+    return {
+        'by_status': by_status,
+        'total': total,
+        'open': open_count,
+        'mean_open_age': mean_open_age,
+        'comments': counters.get(COMMENTS, 0),
+        'comments_per_ticket': counters.get(COMMENTS, 0) / total if total else 0,
+        'created_per_day': [(since + timedelta(days=n), daily.get(since + timedelta(days=n), 0))
+                            for n in range(days)],
+    }
+
+
+def recompute():
+    """Rebuild the summary tables from the ticket and archive tables; returns
+    {counter: (old, new)} for drifted values. Deleted tickets are not counted."""
+    counters = Counter()
+    daily = Counter()
+    # Archived tickets still count, and the archive may be another database, so
+    # each tier is aggregated on its own and the results added up.
+    for ticket, comment in ((Ticket, Comment), (ArchivedTicket, ArchivedComment)):
+        for status, count, created_sum in grouped_by_status(ticket.not_deleted(), model=ticket):
+            counters[status_counter(status)] += count
+            if status in OPEN_STATUSES:
+                counters[OPEN_CREATED_SUM] += int(created_sum)
+        counters[COMMENTS] += db.session.scalar(
+            select(func.count()).select_from(comment).join(ticket, ticket.id == comment.ticket_id)
+            .where(ticket.not_deleted()))
+        for day, count in db.session.execute(
+                select(func.date(ticket.created_at), func.count()).where(ticket.not_deleted())
+                .group_by(func.date(ticket.created_at))):
+            daily[day if isinstance(day, date) else date.fromisoformat(day)] += count
+
+    previous = dict(db.session.execute(select(StatCounter.name, StatCounter.value)).all())
+    previous.update((f'day:{day}', created) for day, created in db.session.execute(
+        select(DailyTicketCount.day, DailyTicketCount.created)))
+    db.session.execute(delete(StatCounter))
+    db.session.execute(delete(DailyTicketCount))
+    if counters:
+        db.session.execute(insert(StatCounter), [{'name': name, 'value': value} for name, value in counters.items()])
+    if daily:
+        db.session.execute(insert(DailyTicketCount), [{'day': day, 'created': count} for day, count in daily.items()])
+    db.session.commit()
+
+    current = dict(counters)
+    current.update((f'day:{day}', count) for day, count in daily.items())
+    return {name: (previous.get(name, 0), current.get(name, 0))
+            for name in previous.keys() | current.keys() if previous.get(name, 0) != current.get(name, 0)}
+
+
+@stats_cli.command('recompute')
+@click.option('--every', type=float, help='Keep running, recomputing every this many seconds.')
+def recompute_command(every):
+    """Recompute the ticket statistics from scratch and report any drift."""
+    while True:
+        drift = recompute()
+        for name, (old, new) in sorted(drift.items()):
+            click.echo(f'{name}: {old} -> {new}')
+        click.echo(f'Statistics recomputed, {len(drift)} counters corrected.')
+        if not every:
+            break
+        time.sleep(every)
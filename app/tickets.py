@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
-from .models import Ticket
-from . import db
+from .models import PRIORITIES, TICKET_STATUSES
+from .queries import dashboard_page, live_ticket_or_404
+from . import db, services
 
 tickets = Blueprint('tickets', __name__)
 
@@ -12,9 +13,7 @@ def create_ticket():
     if request.method == 'POST':
         title = request.form.get('title')
         description = request.form.get('description')
-        new_ticket = Ticket(title=title, description=description, creator_id=current_user.id)
-        db.session.add(new_ticket)
-        db.session.commit()
+        services.create_ticket(current_user, title, description, request.files.getlist('attachments'))
         flash('Your ticket has been created.')
         return redirect(url_for('main.dashboard'))
     return render_template('create_ticket.html')
@@ -23,17 +22,21 @@ def create_ticket():
 @tickets.route('/dashboard', methods=['GET'])
 @login_required
 def dashboard():
+    from .forms import StatusForm
+
     if not current_user.is_hr:
         flash('You do not have access to this page.')
         return redirect(url_for('main.index'))
-    tickets = Ticket.query.all()
-    return render_template('dashboard.html', tickets=tickets)
+    page = dashboard_page(current_user, request.args, current_app.config['TICKETS_PER_PAGE'])
+    return render_template('dashboard.html', tickets=page.items, page=page,
+                           status_choices=StatusForm.status_choices, ticket_statuses=TICKET_STATUSES,
+                           priorities=PRIORITIES)
 
 
 @tickets.route('/ticket/<int:ticket_id>', methods=['GET', 'POST'])
 @login_required
 def ticket(ticket_id):
-    ticket = Ticket.query.get_or_404(ticket_id)
+    ticket = live_ticket_or_404(ticket_id)
     if request.method == 'POST':
         # Update ticket status or add comments based on form input
         pass
@@ -0,0 +1,257 @@
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import insert, select
+from sqlalchemy.orm import aliased
+
+from app import escalation, history, similarity
+from app.extension import db
+from app.models import (ArchivedComment, ArchivedTicket, Comment, OPEN_STATUSES, PRIORITIES, Ticket, TICKET_CATEGORIES,
+                        TICKET_STATUSES, User)
+from app.stats import StatsDelta, epoch
+
+
+tickets_cli = AppGroup('tickets', help='Bulk ticket import and export.')
+
+FIELDS = ['id', 'title', 'description', 'status', 'priority', 'category', 'creator_email', 'created_at', 'updated_at',
+          'comments', 'archived']
+TITLE_LENGTH = Ticket.title.type.length
+
+
+def _format(path, format):
+    if format:
+        return format
+    return 'csv' if os.path.splitext(path)[1].lower() == '.csv' else 'jsonl'
+
+
+def _timestamp(value):
+    return value.isoformat(timespec='microseconds') + 'Z' if value else None
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value.rstrip('Z')) if value else None
+
+
+def read_records(stream, format):
+    """Yield one dict per ticket; CSV rows carry their comments as a JSON column."""
+    if format == 'csv':
+        for record in csv.DictReader(stream):
+            record['comments'] = json.loads(record['comments']) if record.get('comments') else []
+            yield record
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class UserLookup:
+    """Email -> user id, resolved a batch at a time and remembered for the run."""
+
+    def __init__(self):
+        self.ids = {}
+
+    def resolve(self, emails):
+        missing = {email for email in emails if email and email not in self.ids}
+        if missing:
+            found = dict(db.session.execute(select(User.email, User.id).where(User.email.in_(missing))).all())
+            for email in missing:
+                self.ids[email] = found.get(email)
+
+    def get(self, email):
+        return self.ids.get(email)
+
+
+def _ticket_row(record, creator_id, now):
+    created_at = _parse_timestamp(record.get('created_at')) or now
+    status, priority = record.get('status') or 'New', record.get('priority') or 'Normal'
+    return {
+        'title': record['title'],
+        'description': record['description'],
+        'status': status,
+        'priority': priority,
+        'category': record.get('category') or 'Other',
+        'creator_id': creator_id,
+        'created_at': created_at,
+        'updated_at': _parse_timestamp(record.get('updated_at')) or created_at,
+        'due_at': escalation.deadline(priority, created_at) if status in OPEN_STATUSES else None,
+        'sla_started_at': created_at,
+    }
+
+
+def _invalid(record, creator_id):
+    if creator_id is None:
+        return f"unknown creator {record.get('creator_email')!r}"
+    if not record.get('title') or not record.get('description'):
+        return 'missing title or description'
+    if len(record['title']) > TITLE_LENGTH:
+        return f'title longer than {TITLE_LENGTH} characters'
+    if record.get('status') and record['status'] not in TICKET_STATUSES:
+        return f"unknown status {record['status']!r}"
+    if record.get('priority') and record['priority'] not in PRIORITIES:
+        return f"unknown priority {record['priority']!r}"
+    if record.get('category') and record['category'] not in TICKET_CATEGORIES:
+        return f"unknown category {record['category']!r}"
+    return None
+
+
+def import_batch(records, users):
+    """Insert one chunk of tickets and their comments; returns (tickets, comments, rejected)."""
+    users.resolve({record.get('creator_email') for record in records}
+                  | {comment.get('author_email') for record in records for comment in record.get('comments', [])})
+    accepted, rejected = [], []
+    for record in records:
+        creator_id = users.get(record.get('creator_email'))
+        reason = _invalid(record, creator_id)
+        if reason:
+            rejected.append((record, reason))
+        else:
+            accepted.append((record, creator_id))
+    if not accepted:
+        return 0, 0, rejected
+
+    # One executemany per table; RETURNING hands back the new ids in parameter order.
+    now = datetime.utcnow()
+    ticket_rows = [_ticket_row(record, creator_id, now) for record, creator_id in accepted]
+    ticket_ids = db.session.scalars(
+        insert(Ticket).returning(Ticket.id, sort_by_parameter_order=True), ticket_rows).all()
+    comment_rows = []
+    for (record, _), ticket_id in zip(accepted, ticket_ids):
+        for comment in record.get('comments', []):
+            author_id = users.get(comment.get('author_email'))
+            if author_id is None or not comment.get('content'):
+                rejected.append((record, f"skipped comment by {comment.get('author_email')!r}"))
+                continue
+            comment_rows.append({'content': comment['content'], 'ticket_id': ticket_id, 'author_id': author_id})
+    if comment_rows:
+        db.session.execute(insert(Comment), comment_rows)
+    history.tickets_imported([(ticket_id, row['status'], row['created_at'])
+                              for ticket_id, row in zip(ticket_ids, ticket_rows)])
+    similarity.index_tickets([(ticket_id, row['title'], row['description'])
+                              for ticket_id, row in zip(ticket_ids, ticket_rows)])
+
+    stats = StatsDelta()
+    for row in ticket_rows:
+        stats.tickets(row['status'], 1, epoch(row['created_at']))
+        stats.created(row['created_at'].date(), 1)
+    stats.comments(len(comment_rows))
+    stats.apply()
+    return len(ticket_ids), len(comment_rows), rejected
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@tickets_cli.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Tickets per transaction.')
+def import_tickets(source, format, batch_size):
+    """Load tickets (and their comments) from CSV or JSON Lines.
+
+    Creators and comment authors are matched by email and must already exist.
+    Imported tickets do not notify HR.
+    """
+    format = _format(source.name, format)
+    users = UserLookup()
+    totals = [0, 0, 0]
+    for chunk in _chunks(read_records(source, format), batch_size):
+        tickets, comments, rejected = import_batch(chunk, users)
+        db.session.commit()
+        for record, reason in rejected:
+            click.echo(f"Skipped {record.get('title')!r}: {reason}", err=True)
+        totals = [totals[0] + tickets, totals[1] + comments, totals[2] + len(rejected)]
+        click.echo(f'Imported {totals[0]} tickets, {totals[1]} comments...', err=True)
+    click.echo(f'Done: {totals[0]} tickets, {totals[1]} comments imported, {totals[2]} rows skipped.')
+
+
+def _stream(statement, batch_size):
+    # Server-side cursor where the driver has one; rows arrive batch_size at a time.
+    return db.session.execute(statement, execution_options={'yield_per': batch_size})
+
+
+def _merge(tickets, comments, archived):
+    # Both streams are in ticket id order, so each thread is read exactly once.
+    comment = next(comments, None)
+    for id, title, description, status, priority, category, creator_email, created_at, updated_at in tickets:
+        while comment is not None and comment.ticket_id < id:
+            comment = next(comments, None)
+        thread = []
+        while comment is not None and comment.ticket_id == id:
+            thread.append({'author_email': comment.email, 'content': comment.content})
+            comment = next(comments, None)
+        yield {'id': id, 'title': title, 'description': description, 'status': status,
+               'priority': priority, 'category': category, 'creator_email': creator_email, 'created_at': _timestamp(created_at),
+               'updated_at': _timestamp(updated_at), 'comments': thread, 'archived': archived}
+
+
+def export_records(batch_size=1000, include_archived=True):
+    """Yield every ticket with its comments, merging two id-ordered streams per tier.
+
+    Live tickets come first, then (with `include_archived`) those `flask archive run`
+    has moved to the archive tables, which may be another database. Soft-deleted
+    tickets are left out of both.
+    """
+    creator = aliased(User)
+    tickets = _stream(
+        select(Ticket.id, Ticket.title, Ticket.description, Ticket.status, Ticket.priority, Ticket.category,
+               creator.email, Ticket.created_at, Ticket.updated_at)
+        .join(creator, creator.id == Ticket.creator_id)
+        .where(Ticket.not_deleted())
+        .order_by(Ticket.id), batch_size)
+    comments = _stream(
+        select(Comment.ticket_id, User.email, Comment.content)
+        .join(User, User.id == Comment.author_id)
+        .join(Ticket, Ticket.id == Comment.ticket_id).where(Ticket.not_deleted())
+        .order_by(Comment.ticket_id, Comment.id), batch_size)
+    yield from _merge(tickets, comments, archived=False)
+    if not include_archived:
+        return
+    # Emails were copied in when the rows moved.
+    tickets = _stream(
+        select(ArchivedTicket.id, ArchivedTicket.title, ArchivedTicket.description, ArchivedTicket.status,
+               ArchivedTicket.priority, ArchivedTicket.category, ArchivedTicket.creator_email,
+               ArchivedTicket.created_at, ArchivedTicket.updated_at)
+        .where(ArchivedTicket.not_deleted())
+        .order_by(ArchivedTicket.id), batch_size)
+    comments = _stream(
+        select(ArchivedComment.ticket_id, ArchivedComment.author_email.label('email'), ArchivedComment.content)
+        .order_by(ArchivedComment.ticket_id, ArchivedComment.id), batch_size)
+    yield from _merge(tickets, comments, archived=True)
+
+
+@tickets_cli.command('export')
+@click.argument('destination', type=click.File('w', encoding='utf-8'))
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip.')
+@click.option('--archived/--no-archived', 'include_archived', default=True, show_default=True,
+              help='Also export tickets moved to the archive tables, marked "archived": true.')
+def export_tickets(destination, format, batch_size, include_archived):
+    """Write every ticket with its comments as CSV or JSON Lines ('-' for stdout).
+
+    Archived tickets are included unless --no-archived is given; soft-deleted
+    tickets are not exported.
+    """
+    format = _format(destination.name, format)
+    if format == 'csv':
+        writer = csv.DictWriter(destination, fieldnames=FIELDS)
+        writer.writeheader()
+    count = 0
+    for record in export_records(batch_size, include_archived):
+        if format == 'csv':
+            record['comments'] = json.dumps(record['comments'])
+            writer.writerow(record)
+        else:
+            destination.write(json.dumps(record) + '\n')
+        count += 1
+        if count % (batch_size * 10) == 0:
+            click.echo(f'Exported {count} tickets...', err=True)
+    db.session.rollback()  # ends the read transaction and releases the cursors
+    click.echo(f'Exported {count} tickets.', err=True)
@@ -0,0 +1,63 @@
+import os
+
+from flask import current_app
+from flask_login import UserMixin
+
+from app.cache import MISSING, Cache
+from app.extension import db
+from app.models import User
+
+
+# Flask-Login rebuilds current_user on every request. Caching the handful of fields
+# the views and templates read avoids a SELECT per request; entries are dropped as
+# soon as an account is approved, rejected or otherwise changes role. That drop has
+# to reach every worker, so the cache is only used with the shared CACHE_URL backend,
+# or with USER_CACHE_LOCAL on a server that runs a single process.
+user_cache = Cache('user', maxsize=10000, ttl=60)
+
+CACHED_FIELDS = ('id', 'email', 'is_hr', 'is_admin', 'is_approved')
+
+
+class CachedUser(UserMixin):
+    # Read-only stand-in for User rebuilt from the cache; it is never attached to a
+    # session, so code that needs the ORM object must load it explicitly.
+
+    def __init__(self, id, email, is_hr, is_admin, is_approved):
+        self.id = id
+        self.email = email
+        self.is_hr = bool(is_hr)
+        self.is_admin = bool(is_admin)
+        self.is_approved = bool(is_approved)
+
+
+def _load_user_fields(user_id):
+    row = db.session.query(*(getattr(User, field) for field in CACHED_FIELDS)).filter(User.id == user_id).first()
+    return dict(row._mapping) if row else None
+
+
+def user_cache_enabled():
+    config = current_app.config
+    return bool(config.get('CACHE_URL')) or config.get('USER_CACHE_LOCAL', False)
+
+
+def load_cached_user(user_id):
+    if not user_cache_enabled():
+        fields = _load_user_fields(user_id)
+        return CachedUser(**fields) if fields else None
+    fields = user_cache.get(str(user_id))
+    if fields is MISSING:
+        fields = _load_user_fields(user_id)
+        if fields is None:
+            return None
+        user_cache.set(str(user_id), fields)
+    return CachedUser(**fields)
+
+
+def invalidate_user(user_id):
+    user_cache.delete(str(user_id))
+
+
+def init_app(app):
+    # WEB_CONCURRENCY is the worker count gunicorn and most hosts read.
+    if app.config['USER_CACHE_LOCAL'] and int(os.getenv('WEB_CONCURRENCY', 1)) > 1:
+        raise RuntimeError('USER_CACHE_LOCAL needs a single worker process; set CACHE_URL to share the user cache')
@@ -0,0 +1,80 @@
+"""Add full-text search index over tickets and comments
+
+Revision ID: 5f2a9c0d7e31
+Revises: 8c41d2e97b15
+Create Date: 2026-10-18 11:26:04.539822
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2a9c0d7e31'
+down_revision = '8c41d2e97b15'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ticket_fts USING fts5(title, description, content='ticket', content_rowid='id')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(content, content='comment', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS ticket_fts_insert AFTER INSERT ON ticket BEGIN
+        INSERT INTO ticket_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_fts_delete AFTER DELETE ON ticket BEGIN
+        INSERT INTO ticket_fts(ticket_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_fts_update AFTER UPDATE OF title, description ON ticket BEGIN
+        INSERT INTO ticket_fts(ticket_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO ticket_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_insert AFTER INSERT ON comment BEGIN
+        INSERT INTO comment_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_delete AFTER DELETE ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_update AFTER UPDATE OF content ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO comment_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    # Index the rows that already exist (the app may have created the empty index at startup).
+    "INSERT INTO ticket_fts(ticket_fts) VALUES ('rebuild')",
+    "INSERT INTO comment_fts(comment_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    'DROP TRIGGER IF EXISTS comment_fts_update',
+    'DROP TRIGGER IF EXISTS comment_fts_delete',
+    'DROP TRIGGER IF EXISTS comment_fts_insert',
+    'DROP TRIGGER IF EXISTS ticket_fts_update',
+    'DROP TRIGGER IF EXISTS ticket_fts_delete',
+    'DROP TRIGGER IF EXISTS ticket_fts_insert',
+    'DROP TABLE IF EXISTS comment_fts',
+    'DROP TABLE IF EXISTS ticket_fts',
+]
+
+POSTGRESQL_UPGRADE = [
+    "CREATE INDEX IF NOT EXISTS ix_ticket_fts ON ticket USING gin ((to_tsvector('english', ticket.title || ' ' || ticket.description)))",
+    "CREATE INDEX IF NOT EXISTS ix_comment_fts ON comment USING gin ((to_tsvector('english', comment.content)))",
+]
+
+POSTGRESQL_DOWNGRADE = [
+    'DROP INDEX IF EXISTS ix_comment_fts',
+    'DROP INDEX IF EXISTS ix_ticket_fts',
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for statement in {'sqlite': SQLITE_UPGRADE, 'postgresql': POSTGRESQL_UPGRADE}.get(dialect, []):
+        op.execute(sa.text(statement))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for statement in {'sqlite': SQLITE_DOWNGRADE, 'postgresql': POSTGRESQL_DOWNGRADE}.get(dialect, []):
+        op.execute(sa.text(statement))
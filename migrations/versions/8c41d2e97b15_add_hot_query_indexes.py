@@ -0,0 +1,42 @@
+"""Add indexes for the hot query columns
+
+Revision ID: 8c41d2e97b15
+Revises: 3b7e0c9a1f42
+Create Date: 2026-10-18 10:03:57.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d2e97b15'
+down_revision = '3b7e0c9a1f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_is_hr_is_approved', ['is_hr', 'is_approved'], unique=False)
+
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.create_index('ix_ticket_creator_id_id', ['creator_id', 'id'], unique=False)
+        batch_op.create_index('ix_ticket_status_id', ['status', 'id'], unique=False)
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.create_index('ix_comment_ticket_id_id', ['ticket_id', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_comment_author_id'), ['author_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_comment_author_id'))
+        batch_op.drop_index('ix_comment_ticket_id_id')
+
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_index('ix_ticket_status_id')
+        batch_op.drop_index('ix_ticket_creator_id_id')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_is_hr_is_approved')
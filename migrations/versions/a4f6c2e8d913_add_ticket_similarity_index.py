@@ -0,0 +1,37 @@
+"""Add the MinHash signature tables for duplicate detection
+
+Revision ID: a4f6c2e8d913
+Revises: e5d1b8c4f370
+Create Date: 2026-10-18 23:02:48.915306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f6c2e8d913'
+down_revision = 'e5d1b8c4f370'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled for existing tickets by `flask duplicates reindex`; new tickets index themselves.
+    op.create_table('ticket_signature',
+    sa.Column('ticket_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('minhash', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('ticket_id')
+    )
+    op.create_table('ticket_signature_band',
+    sa.Column('band_key', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('ticket_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.PrimaryKeyConstraint('band_key', 'ticket_id')
+    )
+    op.create_index('ix_ticket_signature_band_ticket_id', 'ticket_signature_band', ['ticket_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_ticket_signature_band_ticket_id', table_name='ticket_signature_band')
+    op.drop_table('ticket_signature_band')
+    op.drop_table('ticket_signature')
@@ -0,0 +1,29 @@
+"""Add ticket.updated_at
+
+Revision ID: a61e4b7c2d90
+Revises: 5f2a9c0d7e31
+Create Date: 2026-10-18 12:14:40.771305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a61e4b7c2d90'
+down_revision = '5f2a9c0d7e31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN rather than batch mode: a batch rebuild of `ticket` on SQLite
+    # would silently drop the full-text search triggers defined on it.
+    op.add_column('ticket', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute(sa.text('UPDATE ticket SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL'))
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('ticket', 'updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    op.drop_column('ticket', 'updated_at')
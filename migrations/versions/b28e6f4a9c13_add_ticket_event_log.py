@@ -0,0 +1,45 @@
+"""Add the append-only ticket_event history log
+
+Revision ID: b28e6f4a9c13
+Revises: f17c3d9b0e48
+Create Date: 2026-10-18 20:41:37.190524
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b28e6f4a9c13'
+down_revision = 'f17c3d9b0e48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.SmallInteger(), nullable=False),
+    sa.Column('status', sa.SmallInteger(), nullable=True),
+    sa.Column('actor_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ticket_event_ticket_id_id', 'ticket_event', ['ticket_id', 'id'], unique=False)
+
+    # How long existing tickets have been in their status is not known, so each
+    # live ticket starts with a baseline event (kind 5) at migration time. Status
+    # codes are positions in TICKET_STATUSES, counted from 1.
+    op.execute(sa.text(
+        "INSERT INTO ticket_event (ticket_id, kind, status, created_at) "
+        "SELECT id, 5, CASE status WHEN 'New' THEN 1 WHEN 'In Progress' THEN 2 WHEN 'Resolved' THEN 3 "
+        "WHEN 'Closed' THEN 4 ELSE 0 END, :now FROM ticket WHERE deleted_at IS NULL ORDER BY id"
+    ).bindparams(sa.bindparam('now', datetime.utcnow(), type_=sa.DateTime())))
+
+
+def downgrade():
+    op.drop_index('ix_ticket_event_ticket_id_id', table_name='ticket_event')
+    op.drop_table('ticket_event')
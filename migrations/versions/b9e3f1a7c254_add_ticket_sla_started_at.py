@@ -0,0 +1,26 @@
+"""Add ticket SLA clock start
+
+Revision ID: b9e3f1a7c254
+Revises: f8b2d4a6c081
+Create Date: 2026-10-19 09:12:41.508317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e3f1a7c254'
+down_revision = 'f8b2d4a6c081'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('ticket', sa.Column('sla_started_at', sa.DateTime(), nullable=True))
+    # Every deadline set so far was measured from creation.
+    op.execute('UPDATE ticket SET sla_started_at = created_at WHERE due_at IS NOT NULL')
+
+
+def downgrade():
+    op.drop_column('ticket', 'sla_started_at')
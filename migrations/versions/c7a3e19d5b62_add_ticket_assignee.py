@@ -0,0 +1,33 @@
+"""Add ticket.assignee_id for HR work queues
+
+Revision ID: c7a3e19d5b62
+Revises: b28e6f4a9c13
+Create Date: 2026-10-18 21:36:12.408357
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a3e19d5b62'
+down_revision = 'b28e6f4a9c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN, as for deleted_at: a batch rebuild would drop the search triggers,
+    # so SQLite goes without the foreign key (it cannot add one to an existing table).
+    # Existing tickets start unassigned and are claimed from the pool.
+    op.add_column('ticket', sa.Column('assignee_id', sa.Integer(), nullable=True))
+    if op.get_bind().dialect.name != 'sqlite':
+        op.create_foreign_key('fk_ticket_assignee_id_user', 'ticket', 'user', ['assignee_id'], ['id'])
+    op.create_index('ix_ticket_assignee_id_id', 'ticket', ['assignee_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_ticket_assignee_id_id', table_name='ticket')
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('fk_ticket_assignee_id_user', 'ticket', type_='foreignkey')
+    op.drop_column('ticket', 'assignee_id')
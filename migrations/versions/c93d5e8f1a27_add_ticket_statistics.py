@@ -0,0 +1,55 @@
+"""Add ticket.created_at and the ticket statistics tables
+
+Revision ID: c93d5e8f1a27
+Revises: a61e4b7c2d90
+Create Date: 2026-10-18 15:02:11.408215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c93d5e8f1a27'
+down_revision = 'a61e4b7c2d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN for the same reason as updated_at: a batch rebuild of `ticket`
+    # on SQLite would drop the full-text search triggers. Existing tickets get their
+    # last update time, the closest thing to a creation time they have.
+    op.add_column('ticket', sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.execute(sa.text('UPDATE ticket SET created_at = updated_at WHERE created_at IS NULL'))
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('ticket', 'created_at', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_table('stat_counter',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('daily_ticket_count',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('created', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+    # Seed the counters; `flask stats recompute` rebuilds them the same way.
+    epoch = ("CAST(strftime('%s', created_at) AS INTEGER)" if op.get_bind().dialect.name == 'sqlite'
+             else 'CAST(extract(epoch FROM created_at) AS BIGINT)')
+    op.execute(sa.text("INSERT INTO stat_counter (name, value) "
+                       "SELECT 'tickets:' || status, COUNT(*) FROM ticket WHERE status IS NOT NULL GROUP BY status"))
+    op.execute(sa.text(f"INSERT INTO stat_counter (name, value) "
+                       f"SELECT 'open_created_epoch_sum', COALESCE(SUM({epoch}), 0) FROM ticket "
+                       f"WHERE status IN ('New', 'In Progress')"))
+    op.execute(sa.text("INSERT INTO stat_counter (name, value) SELECT 'comments', COUNT(*) FROM comment"))
+    op.execute(sa.text('INSERT INTO daily_ticket_count (day, created) '
+                       'SELECT date(created_at), COUNT(*) FROM ticket GROUP BY date(created_at)'))
+
+
+def downgrade():
+    op.drop_table('daily_ticket_count')
+    op.drop_table('stat_counter')
+    op.drop_column('ticket', 'created_at')
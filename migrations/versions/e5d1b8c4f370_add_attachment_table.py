@@ -0,0 +1,41 @@
+"""Add the attachment metadata table
+
+Revision ID: e5d1b8c4f370
+Revises: c7a3e19d5b62
+Create Date: 2026-10-18 22:14:05.561930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5d1b8c4f370'
+down_revision = 'c7a3e19d5b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attachment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('comment_id', sa.Integer(), nullable=True),
+    sa.Column('uploader_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('content_type', sa.String(length=100), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_attachment_ticket_id_id', 'attachment', ['ticket_id', 'id'], unique=False)
+    op.create_index(op.f('ix_attachment_comment_id'), 'attachment', ['comment_id'], unique=False)
+    op.create_index(op.f('ix_attachment_sha256'), 'attachment', ['sha256'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_attachment_sha256'), table_name='attachment')
+    op.drop_index(op.f('ix_attachment_comment_id'), table_name='attachment')
+    op.drop_index('ix_attachment_ticket_id_id', table_name='attachment')
+    op.drop_table('attachment')
@@ -0,0 +1,27 @@
+"""Add ticket.deleted_at for soft deletes
+
+Revision ID: f17c3d9b0e48
+Revises: e4b8a2c61f05
+Create Date: 2026-10-18 18:05:52.630114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f17c3d9b0e48'
+down_revision = 'e4b8a2c61f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN: a batch rebuild of `ticket` on SQLite would drop the full-text
+    # search triggers. The archive tables live on the 'archive' bind and are created
+    # by create_all() at startup, wherever ARCHIVE_DATABASE_URI points.
+    op.add_column('ticket', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('ticket', 'deleted_at')
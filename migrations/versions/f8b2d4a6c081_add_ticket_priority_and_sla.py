@@ -0,0 +1,35 @@
+"""Add ticket priority, category and SLA deadline columns
+
+Revision ID: f8b2d4a6c081
+Revises: a4f6c2e8d913
+Create Date: 2026-10-18 23:48:30.274615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8b2d4a6c081'
+down_revision = 'a4f6c2e8d913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN, as for deleted_at. Existing tickets become Normal/Other and
+    # start without a deadline, so the first `flask sla escalate` does not escalate
+    # the whole backlog at once; setting a priority starts a ticket's clock.
+    op.add_column('ticket', sa.Column('priority', sa.String(length=10), nullable=False, server_default='Normal'))
+    op.add_column('ticket', sa.Column('category', sa.String(length=20), nullable=False, server_default='Other'))
+    op.add_column('ticket', sa.Column('due_at', sa.DateTime(), nullable=True))
+    op.add_column('ticket', sa.Column('escalated_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_ticket_due_at', 'ticket', ['due_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_ticket_due_at', table_name='ticket')
+    op.drop_column('ticket', 'escalated_at')
+    op.drop_column('ticket', 'due_at')
+    op.drop_column('ticket', 'category')
+    op.drop_column('ticket', 'priority')
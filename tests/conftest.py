@@ -0,0 +1,56 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app  # noqa: E402
+from app.extension import db  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """make_app(**config) -> an app on a scratch database, with these config overrides."""
+    def build(**config):
+        return create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+            'ATTACHMENT_DIR': str(tmp_path / 'attachments'),
+            'MAIL_QUEUE_WORKER': 'external',  # no background thread
+            'RATE_LIMIT_ENABLED': False,
+            'WTF_CSRF_ENABLED': False,
+            'TESTING': True,
+            **config,
+        })
+    return build
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def users(app):
+    """Ids of an approved HR user and an associate."""
+    with app.app_context():
+        hr = User(email='hr@example.com', password_hash='x', is_hr=True, is_approved=True)
+        associate = User(email='associate@example.com', password_hash='x')
+        db.session.add_all([hr, associate])
+        db.session.commit()
+        return SimpleNamespace(hr=hr.id, associate=associate.id)
+
+
+@pytest.fixture
+def login(app):
+    """login(user_id) -> a test client signed in as that user."""
+    def client_for(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)  # Flask-Login's session key
+            session['_fresh'] = True
+        return client
+    return client_for
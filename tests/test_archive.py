@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, update
+
+from app import archive, transfer
+from app.extension import db
+from app.models import ArchivedComment, ArchivedTicket, Comment, Ticket
+
+
+def closed_ticket(creator_id, title, comments=0, **fields):
+    long_ago = datetime.utcnow() - timedelta(days=365)
+    ticket = Ticket(title=title, description='Printer jams', status='Closed', creator_id=creator_id,
+                    created_at=long_ago, updated_at=long_ago, **fields)
+    db.session.add(ticket)
+    db.session.flush()
+    db.session.add_all(Comment(content=f'{title} {n}', ticket_id=ticket.id, author_id=creator_id)
+                       for n in range(comments))
+    return ticket.id
+
+
+def test_archive_batch_keeps_tickets_changed_after_the_copy(app, users):
+    with app.app_context():
+        untouched, commented, reopened = (closed_ticket(users.associate, title, comments=2)
+                                          for title in ('untouched', 'commented', 'reopened'))
+        db.session.commit()
+
+        def change_tickets_once(session):
+            # Runs right after the batch was read, as a request on another worker would.
+            now = datetime.utcnow()
+            with db.engine.begin() as connection:
+                connection.execute(insert(Comment).values(content='late reply', ticket_id=commented,
+                                                          author_id=users.hr))
+                connection.execute(update(Ticket).where(Ticket.id == commented).values(updated_at=now))
+                connection.execute(update(Ticket).where(Ticket.id == reopened).values(status='New', updated_at=now))
+
+        event.listen(db.session, 'after_commit', change_tickets_once, once=True)
+        assert archive.archive_batch([untouched, commented, reopened]) == (1, 2)
+
+        assert db.session.get(Ticket, untouched) is None
+        assert db.session.get(ArchivedTicket, untouched) is not None
+        assert ArchivedComment.query.filter_by(ticket_id=untouched).count() == 2
+        for ticket_id, comments in ((commented, 3), (reopened, 2)):
+            assert db.session.get(Ticket, ticket_id) is not None
+            assert Comment.query.filter_by(ticket_id=ticket_id).count() == comments
+            assert db.session.get(ArchivedTicket, ticket_id) is None
+            assert ArchivedComment.query.filter_by(ticket_id=ticket_id).count() == 0
+
+
+def test_archived_tickets_keep_priority_category_and_sla_fields(app, users):
+    escalated_at = datetime.utcnow() - timedelta(days=300)
+    with app.app_context():
+        ticket_id = closed_ticket(users.associate, 'escalated', priority='Urgent', category='Network',
+                                  assignee_id=users.hr, sla_started_at=escalated_at - timedelta(hours=4),
+                                  escalated_at=escalated_at)
+        db.session.commit()
+        assert archive.archive_batch([ticket_id]) == (1, 0)
+
+        archived = db.session.get(ArchivedTicket, ticket_id)
+        assert (archived.priority, archived.category, archived.assignee_id, archived.escalated_at) == (
+            'Urgent', 'Network', users.hr, escalated_at)
+        [record] = transfer.export_records()
+        assert (record['archived'], record['priority'], record['category']) == (True, 'Urgent', 'Network')
@@ -0,0 +1,25 @@
+import time
+
+from flask import g, render_template_string
+
+from app import instrumentation
+
+
+def test_render_time_includes_the_outer_template_around_nested_renders(make_app):
+    app = make_app(SQL_INSTRUMENTATION=True)
+
+    def fragment():
+        return render_template_string('<li>row</li>')  # like fragments.ticket_row inside dashboard.html
+
+    def slow():
+        time.sleep(0.05)
+        return ''
+
+    with app.test_request_context('/dashboard'):
+        instrumentation._start_request()
+        started = time.perf_counter()
+        render_template_string('{{ fragment() }}{{ slow() }}{{ fragment() }}', fragment=fragment, slow=slow)
+        elapsed = time.perf_counter() - started
+
+        assert 0.05 <= g.perf.render_time <= elapsed
+        assert g.perf.render_started == []
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from app.extension import db
+from app.mailqueue import MailWorker, enqueue_mail
+from app.mailsink import SMTPSink
+from app.models import OutboundEmail
+
+
+def test_worker_delivers_to_the_sink_and_retries_when_it_is_gone(make_app):
+    with SMTPSink('127.0.0.1', 0) as sink:
+        sink.start()
+        app = make_app(MAIL_SERVER='127.0.0.1', MAIL_PORT=sink.port, MAIL_USE_TLS=False,
+                       MAIL_SUPPRESS_SEND=False)  # TESTING would otherwise suppress sending
+        worker = MailWorker(app)
+        with app.app_context():
+            delivered = enqueue_mail('Ticket #1 updated', 'helpdesk@example.com', ['hr@example.com'], 'Closed.')
+            db.session.commit()
+            worker.drain()
+
+            [(envelope_from, envelope_to, message)] = sink.messages
+            assert (envelope_from, envelope_to) == ('helpdesk@example.com', ['hr@example.com'])
+            assert message['Subject'] == 'Ticket #1 updated'
+            delivered = db.session.get(OutboundEmail, delivered.id)
+            assert (delivered.status, delivered.attempts) == ('sent', 1)
+
+    with app.app_context():
+        failed = enqueue_mail('Ticket #2 updated', 'helpdesk@example.com', ['hr@example.com'], 'Reopened.')
+        db.session.commit()
+        worker.drain()  # nothing listens on the sink's port any more
+
+        failed = db.session.get(OutboundEmail, failed.id)
+        assert (failed.status, failed.attempts) == ('pending', 1)
+        assert failed.last_error and failed.next_attempt_at > datetime.utcnow()
+    assert len(sink.messages) == 1
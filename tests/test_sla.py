@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from app import escalation, services
+from app.extension import db
+from app.models import Ticket
+
+
+def closed_ticket(creator_id, age):
+    created = datetime.utcnow() - age
+    ticket = Ticket(title='VPN drops', description='Disconnects every hour', creator_id=creator_id,
+                    status='Closed', priority='Normal', created_at=created, updated_at=created)
+    db.session.add(ticket)
+    db.session.commit()
+    return ticket
+
+
+def test_priority_change_after_reopen_keeps_the_reopened_clock(app, users):
+    with app.app_context():
+        ticket = closed_ticket(users.associate, timedelta(days=10))
+        services.change_status(ticket, 'In Progress')
+        reopened_at = ticket.sla_started_at
+        assert reopened_at > ticket.created_at + timedelta(days=9)
+
+        services.change_priority(ticket, 'High')
+
+        assert ticket.due_at == reopened_at + timedelta(hours=24)
+        assert escalation.run_escalation(batch_size=100) == 0
+        assert db.session.get(Ticket, ticket.id).priority == 'High'
+
+
+def test_priority_change_after_bulk_reopen_keeps_the_reopened_clock(app, users):
+    with app.app_context():
+        ticket_id = closed_ticket(users.associate, timedelta(days=10)).id
+        services.bulk_change_status('New', [ticket_id])
+        ticket = db.session.get(Ticket, ticket_id)
+        db.session.refresh(ticket)
+        assert ticket.sla_started_at > ticket.created_at + timedelta(days=9)
+
+        services.change_priority(ticket, 'Urgent')
+
+        assert ticket.due_at == ticket.sla_started_at + timedelta(hours=4)
+        assert escalation.run_escalation(batch_size=100) == 0
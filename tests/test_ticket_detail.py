@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app.extension import db
+from app.models import Comment, Ticket, TICKET_STATUSES, User
+
+
+@pytest.fixture
+def app(make_app):
+    # With the signed-in user cache on, as when a single process serves the app.
+    return make_app(USER_CACHE_LOCAL=True)
+
+
+def ticket_with_comments(creator_id, count):
+    authors = [User(email=f'author{count}-{n}@example.com', password_hash='x') for n in range(count)]
+    ticket = Ticket(title=f'{count} comments', description='Printer jams', creator_id=creator_id)
+    db.session.add_all([ticket, *authors])
+    db.session.flush()
+    # Every comment has its own author, so a per-comment author lookup would show.
+    db.session.add_all(Comment(content=f'comment {n}', ticket_id=ticket.id, author_id=author.id)
+                       for n, author in enumerate(authors))
+    db.session.commit()
+    return ticket.id
+
+
+@contextmanager
+def counting_queries(app):
+    counter = {'queries': 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter['queries'] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+
+@pytest.mark.parametrize('many', [20, 50])
+def test_view_ticket_query_count_does_not_grow_with_comments(app, users, login, many):
+    app.config['COMMENTS_PER_PAGE'] = 50
+    with app.app_context():
+        few_id, many_id = ticket_with_comments(users.associate, 3), ticket_with_comments(users.associate, many)
+    client = login(users.hr)
+    client.get('/dashboard')  # loads the signed-in user into its cache, as any earlier request would
+
+    counts = []
+    for ticket_id in (few_id, many_id):
+        with counting_queries(app) as counter:
+            response = client.get(f'/ticket/{ticket_id}')
+        assert response.status_code == 200
+        counts.append(counter['queries'])
+
+    assert response.get_data(as_text=True).count('<li class="mb-3">') == many
+    assert counts[0] == counts[1]
+
+
+def test_status_form_offers_every_status_and_selects_the_current_one(app, users, login):
+    with app.app_context():
+        ticket = Ticket(title='Resolved', description='Printer jams', status='Resolved', creator_id=users.associate)
+        db.session.add(ticket)
+        db.session.commit()
+        ticket_id = ticket.id
+    client = login(users.hr)
+
+    page = client.get(f'/ticket/{ticket_id}').get_data(as_text=True)
+    for status in TICKET_STATUSES:
+        assert f'value="{status}">{status}</option>' in page
+    assert '<option selected value="Resolved">' in page
+
+    client.post(f'/ticket/{ticket_id}/change_status', data={'status': 'Closed'})
+    with app.app_context():
+        assert db.session.get(Ticket, ticket_id).status == 'Closed'